@@ -0,0 +1,145 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Value
+from django.utils import timezone
+
+from rest_framework.exceptions import ValidationError
+
+from . import changes
+from .db import delete_rows
+from .models import ArchivedComment, ArchivedIssue, Change, Comment, Issue, Project
+
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_QUERY_PARAM = "include_archived"
+TRUE_VALUES = ("1", "true", "yes")
+FALSE_VALUES = ("", "0", "false", "no")
+
+
+def include_archived(request):
+    """
+    return: True when the request asks to read the archive too, with ?include_archived=1.
+    """
+    value = request.query_params.get(ARCHIVE_QUERY_PARAM, "").lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValidationError({ARCHIVE_QUERY_PARAM: ["Expected 1 or 0."]})
+
+
+def copy_rows(rows, model, **values):
+    """
+    Copy the rows of a queryset into the table of the model with one
+    INSERT ... SELECT. The columns the rows do not have are set from values.
+    return: number of rows copied
+    """
+    source = {field.attname for field in rows.model._meta.concrete_fields}
+    names = [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.attname in source or field.attname in values
+    ]
+    select = rows.annotate(
+        **{
+            name: Value(value, output_field=model._meta.get_field(name))
+            for name, value in values.items()
+        }
+    ).values_list(*names)
+    sql, params = select.query.sql_with_params()
+    connection = connections[rows.db]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ", ".join(
+        connection.ops.quote_name(model._meta.get_field(name).column) for name in names
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {table} ({columns}) {sql}", params)
+        return cursor.rowcount
+
+
+def archivable_issues(older_than):
+    """
+    return: the closed issues created before older_than, outside of the deleted
+            projects (the soft-deleted issues are left to the purge).
+    """
+    return Issue.objects.filter(
+        status=Issue.DONE,
+        created_time__lt=older_than,
+        project__deleted_time__isnull=True,
+    ).order_by("pk")
+
+
+def move_issues(ids, to_archive):
+    """
+    Move the issues with their comments between the hot and the archive tables.
+    The statistics do not change, an archived issue still counts in its project.
+    """
+    hot, cold = (Issue, Comment), (ArchivedIssue, ArchivedComment)
+    (source_issue, source_comment), (target_issue, target_comment) = (
+        (hot, cold) if to_archive else (cold, hot)
+    )
+    values = {"archived_time": timezone.now()} if to_archive else {}
+    issues = source_issue._base_manager.filter(pk__in=ids)
+    comments = source_comment._base_manager.filter(issue_id__in=ids)
+    issue_projects = dict(issues.values_list("pk", "project_id"))
+    # for the sync clients an archived issue is a deleted one, removing its
+    # comments, so the comments of a restored issue are sent again
+    restored_comments = []
+    if not to_archive:
+        restored_comments = [
+            (issue_projects[issue_id], comment_id)
+            for comment_id, issue_id in comments.values_list("pk", "issue_id")
+        ]
+    copy_rows(issues, target_issue, **values)
+    copy_rows(comments, target_comment)
+    delete_rows(comments)
+    delete_rows(issues)
+    changes.record_objects(
+        Change.ISSUE,
+        [(project_id, issue_id) for issue_id, project_id in issue_projects.items()],
+        Change.DELETE if to_archive else Change.CREATE,
+    )
+    changes.record_objects(Change.COMMENT, restored_comments, Change.CREATE)
+    # the hot list of the project changed, its cached responses are stale
+    Project.bump_version(pk__in=set(issue_projects.values()))
+
+
+def archive(older_than=None, batch_size=ARCHIVE_BATCH_SIZE, max_batches=None, progress=None):
+    """
+    Move the closed issues created before older_than (default: SOFTDESK_ARCHIVE_AFTER_DAYS
+    ago) with their comments to the archive, one transaction per batch of issues.
+    Stopping at any point is safe: the next run continues with the issues left.
+    progress: called with (issues archived by the batch, total).
+    return: (archived issues, True when every archivable issue was archived)
+    """
+    if older_than is None:
+        days = getattr(settings, "SOFTDESK_ARCHIVE_AFTER_DAYS", 90)
+        older_than = timezone.now() - timedelta(days=days)
+    archived = 0
+    batches = 0
+    while True:
+        if max_batches is not None and batches >= max_batches:
+            return archived, False
+        with transaction.atomic():
+            ids = list(archivable_issues(older_than).values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                return archived, True
+            move_issues(ids, to_archive=True)
+        batches += 1
+        archived += len(ids)
+        if progress is not None:
+            progress(len(ids), archived)
+
+
+def restore(issues):
+    """
+    Move archived issues (a queryset of ArchivedIssue) back to the hot tables,
+    e.g. before reopening them.
+    return: number of issues restored
+    """
+    with transaction.atomic():
+        ids = list(issues.values_list("pk", flat=True))
+        if ids:
+            move_issues(ids, to_archive=False)
+    return len(ids)
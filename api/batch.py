@@ -0,0 +1,297 @@
+import io
+import json
+import logging
+import re
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+from rest_framework import serializers, status
+from rest_framework.permissions import SAFE_METHODS
+
+from .cache import shared_lookups
+from .db import new_routing, on_primary, read_from_replicas
+from .mixins import ReplicaReadMixin
+
+logger = logging.getLogger(__name__)
+
+# {<id of a previous request>.<key or index>...}, "*" fans out over a list
+REFERENCE = re.compile(r"\{([A-Za-z0-9_-]+)((?:\.[A-Za-z0-9_*-]+)*)\}")
+# routes of api/urls.py that cannot run inside a batch
+EXCLUDED_ROUTES = ("batch",)
+EXCLUDED_NAMESPACES = ("rest_framework",)
+
+
+class MissingValue(Exception):
+    pass
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """
+    One sub-request of a batch.
+    """
+
+    id = serializers.RegexField(r"^[A-Za-z0-9_-]+$", max_length=64)
+    method = serializers.ChoiceField(choices=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False)
+    depends_on = serializers.ListField(
+        child=serializers.CharField(), required=False, default=list
+    )
+
+    def validate_path(self, path):
+        if not path.startswith("/"):
+            raise serializers.ValidationError("The path must start with /.")
+        return path
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, items):
+        max_requests = max_batch_requests()
+        if len(items) > max_requests:
+            raise serializers.ValidationError(f"A batch runs {max_requests} requests at most.")
+        seen = set()
+        for item in items:
+            if item["id"] in seen:
+                raise serializers.ValidationError(f'The id "{item["id"]}" is used twice.')
+            dependencies = set(item["depends_on"]) | references(item)
+            unknown = dependencies - seen
+            if unknown:
+                raise serializers.ValidationError(
+                    f'The request "{item["id"]}" depends on {", ".join(sorted(unknown))}, '
+                    "which must come before it."
+                )
+            item["depends_on"] = dependencies
+            seen.add(item["id"])
+        return items
+
+
+def max_batch_requests():
+    return getattr(settings, "SOFTDESK_BATCH_MAX_REQUESTS", 20)
+
+
+def references(item):
+    """
+    return: the ids of the requests referenced by the path and the body of item.
+    """
+    text = item["path"] + json.dumps(item.get("body"))
+    return {match[1] for match in REFERENCE.finditer(text)}
+
+
+def lookup(results, name, keys):
+    """
+    return: the value at keys (".a.0.b") in the body of the result name,
+            a list of values when keys hold a "*".
+    """
+    values, fan_out = [results[name]["body"]], False
+    for key in keys.split(".")[1:]:
+        if key == "*":
+            fan_out = True
+            values = [value for items in values for value in as_list(items, key)]
+            continue
+        values = [child(value, key) for value in values]
+    return values if fan_out else values[0]
+
+
+def as_list(value, key):
+    if not isinstance(value, list):
+        raise MissingValue(f'"{key}" expects a list.')
+    return value
+
+
+def child(value, key):
+    try:
+        if isinstance(value, list):
+            return value[int(key)]
+        return value[key]
+    except (KeyError, IndexError, TypeError, ValueError):
+        raise MissingValue(f'No value at "{key}".')
+
+
+def substitute(value, results, item=None):
+    """
+    Replace the references in a string or in the strings of a JSON value.
+    A string made of a single reference takes the referenced value (e.g. an int).
+    item: value of the fanned out reference for this sub-request.
+    """
+    if isinstance(value, dict):
+        return {key: substitute(child, results, item) for key, child in value.items()}
+    if isinstance(value, list):
+        return [substitute(child, results, item) for child in value]
+    if not isinstance(value, str):
+        return value
+
+    def resolve_match(match):
+        if "*" in match[2]:
+            return item
+        return lookup(results, match[1], match[2])
+
+    match = REFERENCE.fullmatch(value)
+    if match:
+        return resolve_match(match)
+    return REFERENCE.sub(lambda match: str(resolve_match(match)), value)
+
+
+def fan_out(item, results):
+    """
+    return: the values of the "*" reference of item, or None without one.
+    """
+    text = item["path"] + json.dumps(item.get("body"))
+    expressions = {match[0] for match in REFERENCE.finditer(text) if "*" in match[2]}
+    if not expressions:
+        return None
+    if len(expressions) > 1:
+        raise MissingValue("A request can fan out over one reference only.")
+    match = REFERENCE.fullmatch(expressions.pop())
+    values = lookup(results, match[1], match[2])
+    if len(values) > max_batch_requests():
+        raise MissingValue(
+            f"{match[0]} has {len(values)} values, a request fans out over "
+            f"{max_batch_requests()} at most."
+        )
+    return values
+
+
+class Batch:
+    """
+    Sub-requests run in-process, in order, for one authenticated request:
+        - each one goes through the api view of its path, with the user of the
+          batch (no authentication per sub-request) and the membership lookups
+          shared by the whole batch (see cache.shared_lookups) ;
+        - "{id.key.0}" in a path or a body is replaced by a value of the body of
+          a previous response, "{id.results.*.id}" runs the request once per value ;
+        - a request depending on a failed one is not run (424) ;
+        - the safe-method requests of the api viewsets read from the replica of the
+          batch (see mixins.ReplicaReadMixin) until a write of the batch, the other
+          requests read from the primary.
+    The sub-requests are not atomic together, each write is committed on its own.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.routing = None
+
+    def run(self, items):
+        """
+        return: [{"id", "status", "body"}, ...] in the order of items. A fanned out
+                request has the list of the bodies, their status codes in
+                "statuses" and 207 as status, or the worst status if one failed.
+        """
+        results = {}
+        self.routing = new_routing()
+        with shared_lookups():
+            for item in items:
+                results[item["id"]] = self.run_item(item, results)
+        return [{"id": item["id"], **results[item["id"]]} for item in items]
+
+    def run_item(self, item, results):
+        failed = [name for name in sorted(item["depends_on"]) if results[name]["status"] >= 400]
+        if failed:
+            return failure(
+                status.HTTP_424_FAILED_DEPENDENCY,
+                f"The request {', '.join(failed)} failed.",
+            )
+        try:
+            values = fan_out(item, results)
+            if values is None:
+                return self.call(
+                    item["method"],
+                    substitute(item["path"], results),
+                    substitute(item.get("body"), results),
+                )
+            responses = [
+                self.call(
+                    item["method"],
+                    substitute(item["path"], results, value),
+                    substitute(item.get("body"), results, value),
+                )
+                for value in values
+            ]
+        except MissingValue as error:
+            return failure(status.HTTP_424_FAILED_DEPENDENCY, str(error))
+        statuses = [response["status"] for response in responses]
+        worst = max(statuses, default=status.HTTP_200_OK)
+        return {
+            "status": worst if worst >= 400 else status.HTTP_207_MULTI_STATUS,
+            "body": [response["body"] for response in responses],
+            "statuses": statuses,
+        }
+
+    def call(self, method, path, body):
+        """
+        Run one sub-request through the view of its path.
+        return: {"status", "body"}
+        """
+        url = urlsplit(path)
+        try:
+            match = resolve(url.path, urlconf="api.urls")
+        except Resolver404:
+            return failure(status.HTTP_404_NOT_FOUND, f"No api route for {url.path}.")
+        if match.url_name in EXCLUDED_ROUTES or match.namespace in EXCLUDED_NAMESPACES:
+            return failure(status.HTTP_400_BAD_REQUEST, f"{url.path} cannot run in a batch.")
+
+        content = b"" if body is None else json.dumps(body, cls=DjangoJSONEncoder).encode()
+        sub_request = HttpRequest()
+        sub_request.method = method
+        sub_request.path = sub_request.path_info = url.path
+        sub_request.META = {
+            key: value
+            for key, value in self.request.META.items()
+            # the conditional headers of the batch are not the ones of its requests
+            if not key.startswith("HTTP_IF_")
+        }
+        sub_request.META.update(
+            {
+                "REQUEST_METHOD": method,
+                "PATH_INFO": url.path,
+                "QUERY_STRING": url.query,
+                "CONTENT_TYPE": "application/json",
+                "CONTENT_LENGTH": str(len(content)),
+                "HTTP_ACCEPT": "application/json",
+            }
+        )
+        sub_request.GET = QueryDict(url.query)
+        sub_request._stream = io.BytesIO(content)
+        sub_request._read_started = False
+        sub_request.resolver_match = match
+        # read by rest_framework.request.Request instead of the authenticators
+        sub_request._force_auth_user = self.request.user
+        sub_request._force_auth_token = self.request.auth
+
+        view_class = getattr(match.func, "cls", None)
+        replica = (
+            method in SAFE_METHODS
+            and isinstance(view_class, type)
+            and issubclass(view_class, ReplicaReadMixin)
+        )
+        try:
+            with read_from_replicas(self.routing) if replica else on_primary():
+                response = match.func(sub_request, *match.args, **match.kwargs)
+        except Exception:
+            logger.exception("batch request %s %s failed", method, path)
+            return failure(status.HTTP_500_INTERNAL_SERVER_ERROR, "Server error.")
+        finally:
+            if method not in SAFE_METHODS and self.routing is not None:
+                # the next requests read the writes of this one
+                self.routing.pinned = True
+        # response.close() is not called: it sends request_finished, whose
+        # close_old_connections would drop the database connection of the batch
+        if response.streaming:
+            # its content is not iterated, the generator never started
+            return failure(status.HTTP_400_BAD_REQUEST, f"{url.path} cannot run in a batch.")
+        if hasattr(response, "data"):
+            data = response.data
+        elif response.content and response.get("Content-Type", "").startswith("application/json"):
+            data = json.loads(response.content)
+        else:
+            data = None
+        return {"status": response.status_code, "body": data}
+
+
+def failure(status_code, detail):
+    return {"status": status_code, "body": {"detail": detail}}
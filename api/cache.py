@@ -0,0 +1,237 @@
+import hashlib
+import pickle
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Contributor
+
+# Lookups shared by the requests run inside shared_lookups(), e.g. one batch
+request_lookups = ContextVar("softdesk_request_lookups", default=None)
+
+
+@contextmanager
+def shared_lookups():
+    """
+    Keep the membership lookups made inside the block in memory, so the
+    sub-requests of a batch check each membership once.
+    """
+    token = request_lookups.set({})
+    try:
+        yield
+    finally:
+        request_lookups.reset(token)
+
+
+class CacheStats:
+    """
+    Thread safe hit / miss counters of one process.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+        }
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+class MembershipCache:
+    """
+    Cross-request cache of project memberships:
+        - keyed by (user, project), the value is the contributor's role ;
+        - non-members are cached too so repeated refusals stay cheap ;
+        - backed by any Django cache backend (SOFTDESK_MEMBERSHIP_CACHE alias) ;
+        - invalidated by the Contributor / Project signals (see signals.py).
+    """
+
+    NOT_MEMBER = ""
+
+    def __init__(self):
+        self.counter = CacheStats()
+
+    @property
+    def backend(self):
+        return caches[getattr(settings, "SOFTDESK_MEMBERSHIP_CACHE", "default")]
+
+    @property
+    def timeout(self):
+        return getattr(settings, "SOFTDESK_MEMBERSHIP_CACHE_TIMEOUT", 300)
+
+    @staticmethod
+    def make_key(user_id, project_id):
+        return f"softdesk:membership:{project_id}:{user_id}"
+
+    def get_role(self, user_id, project_id):
+        """
+        return: the role of the user in the project, or None if not a contributor.
+        """
+        key = self.make_key(user_id, project_id)
+        lookups = request_lookups.get()
+        if lookups is not None and key in lookups:
+            return lookups[key] or None
+
+        role = self.backend.get(key)
+        if role is not None:
+            self.counter.count(hit=True)
+        else:
+            self.counter.count(hit=False)
+            # cached across requests: read from the primary, never a replica
+            role = (
+                Contributor.objects.using(DEFAULT_DB_ALIAS)
+                .filter(project=project_id, user=user_id)
+                .values_list("role", flat=True)
+                .first()
+            ) or self.NOT_MEMBER
+            self.backend.set(key, role, self.timeout)
+        if lookups is not None:
+            lookups[key] = role
+        return role or None
+
+    def is_contributor(self, user_id, project_id):
+        return self.get_role(user_id, project_id) is not None
+
+    def is_author(self, user_id, project_id):
+        return self.get_role(user_id, project_id) == Contributor.AUTHOR
+
+    def invalidate(self, project_id, user_ids):
+        """
+        Drop the cached memberships of the given users on a project.
+        """
+        keys = [self.make_key(user_id, project_id) for user_id in user_ids]
+        lookups = request_lookups.get()
+        if lookups is not None:
+            for key in keys:
+                lookups.pop(key, None)
+        if keys:
+            self.backend.delete_many(keys)
+
+    def stats(self):
+        """
+        return: hit / miss counters of this process since the last reset.
+        """
+        return self.counter.as_dict()
+
+    def reset_stats(self):
+        self.counter.reset()
+
+
+membership_cache = MembershipCache()
+
+
+class ResponseCache:
+    """
+    Server-side cache of serialized list / detail responses:
+        - keyed by the project version, the view, the serializer class and
+          the request (path, query parameters, host and negotiated format),
+          so any change to the project makes the old entries unreachable ;
+        - backed by any Django cache backend (SOFTDESK_RESPONSE_CACHE alias) ;
+        - entries over SOFTDESK_RESPONSE_CACHE_MAX_ENTRY_SIZE bytes are not stored ;
+        - at most SOFTDESK_RESPONSE_CACHE_MAX_ENTRIES are kept per process, the
+          least recently used ones are deleted from the backend first.
+    """
+
+    def __init__(self):
+        self.counter = CacheStats()
+        self.evictions = 0
+        self._lock = Lock()
+        self._keys = OrderedDict()
+
+    @property
+    def backend(self):
+        return caches[getattr(settings, "SOFTDESK_RESPONSE_CACHE", "default")]
+
+    @property
+    def timeout(self):
+        return getattr(settings, "SOFTDESK_RESPONSE_CACHE_TIMEOUT", 300)
+
+    @property
+    def max_entries(self):
+        return getattr(settings, "SOFTDESK_RESPONSE_CACHE_MAX_ENTRIES", 1000)
+
+    @property
+    def max_entry_size(self):
+        return getattr(settings, "SOFTDESK_RESPONSE_CACHE_MAX_ENTRY_SIZE", 512 * 1024)
+
+    @staticmethod
+    def make_key(view, request, project_id, version):
+        request_key = "|".join(
+            [request.get_host(), request.get_full_path(), request.accepted_media_type]
+        )
+        digest = hashlib.md5(request_key.encode()).hexdigest()
+        serializer = view.get_serializer_class().__name__
+        return (
+            f"softdesk:response:{project_id}:{version}:"
+            f"{type(view).__name__}:{view.action}:{serializer}:{digest}"
+        )
+
+    def get(self, key):
+        """
+        return: the cached response data, or None.
+        """
+        payload = self.backend.get(key)
+        self.counter.count(hit=payload is not None)
+        if payload is None:
+            return None
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+        return pickle.loads(payload)
+
+    def set(self, key, data):
+        payload = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_entry_size:
+            return
+        self.backend.set(key, payload, self.timeout)
+
+        evicted = []
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_entries:
+                evicted.append(self._keys.popitem(last=False)[0])
+            self.evictions += len(evicted)
+        if evicted:
+            self.backend.delete_many(evicted)
+
+    def stats(self):
+        """
+        return: hit / miss counters, evictions and entries of this process.
+        """
+        stats = self.counter.as_dict()
+        with self._lock:
+            stats.update(evictions=self.evictions, entries=len(self._keys))
+        return stats
+
+    def reset_stats(self):
+        self.counter.reset()
+        with self._lock:
+            self.evictions = 0
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,178 @@
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Subquery
+
+from . import pubsub
+from .models import Change, ChangeHorizon, Comment, Contributor, Issue, Project
+from .serializers import CommentSerializer, ContributorSerializer, IssueDetailSerializer
+from .values import field_columns, rows
+
+CHANGES_BATCH_SIZE = 100
+COMPACT_BATCH_SIZE = 1000
+
+
+class ChangesExpired(Exception):
+    """
+    The changes after the token were removed by the retention.
+    """
+
+    def __init__(self, horizon):
+        super().__init__(f"The changes up to {horizon} were removed.")
+        self.horizon = horizon
+
+
+def record(project_id, model, object_ids, action):
+    """
+    Add the changes of objects of a project to its log, with one insert in the
+    transaction of the write. project_id can be an expression (see record_comment).
+    """
+    record_objects(model, [(project_id, object_id) for object_id in object_ids], action)
+
+
+def record_objects(model, objects, action):
+    """
+    objects: [(project_id, object_id), ...], of any projects.
+    The entries are pushed to the live connections of the projects after commit.
+    """
+    entries = Change.objects.bulk_create(
+        Change(project_id=project_id, model=model, object_id=object_id, action=action)
+        for project_id, object_id in objects
+    )
+    pubsub.publish_changes(entries)
+
+
+def record_comment(comment, action):
+    """
+    The project of the comment is read by the insert itself.
+    """
+    project_id = Subquery(
+        Issue.all_objects.filter(pk=comment.issue_id).values("project_id")[:1]
+    )
+    record(project_id, Change.COMMENT, [comment.pk], action)
+
+
+def feeds(project_id):
+    """
+    return: {model: (queryset of the project's live objects, serializer class)}
+    """
+    return {
+        Change.ISSUE: (Issue.objects.filter(project_id=project_id), IssueDetailSerializer),
+        Change.COMMENT: (
+            Comment.objects.filter(issue__project_id=project_id),
+            CommentSerializer,
+        ),
+        Change.CONTRIBUTOR: (
+            Contributor.objects.filter(project_id=project_id),
+            ContributorSerializer,
+        ),
+    }
+
+
+def current_sequence():
+    """
+    return: the token to sync from after downloading a project.
+    """
+    return Change.objects.aggregate(seq=Max("id"))["seq"] or 0
+
+
+def changes_since(project_id, since, limit=CHANGES_BATCH_SIZE):
+    """
+    return: (changes, next token, True if more changes follow) for the changes
+            of the project after the since token, at most limit log entries.
+    The entries of one object are merged into its last one, with the object as
+    it is now in "data": create and update are upserts for the client, and an
+    object gone since (deleted, archived or purged) is a delete.
+    A deleted issue removes its comments.
+    Raise ChangesExpired when the retention removed changes after since.
+    """
+    horizon = (
+        ChangeHorizon.objects.filter(project_id=project_id)
+        .values_list("seq", flat=True)
+        .first()
+    )
+    if horizon is not None and since < horizon:
+        raise ChangesExpired(horizon)
+
+    entries = list(
+        Change.objects.filter(project_id=project_id, id__gt=since)
+        .order_by("id")
+        .values_list("id", "model", "object_id", "action")[: limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+    latest = {}
+    for seq, model, object_id, action in entries:
+        # moved to the end, the changes keep the order of their last entry
+        latest.pop((model, object_id), None)
+        latest[(model, object_id)] = (seq, action)
+
+    objects = {}
+    for model, (queryset, serializer_class) in feeds(project_id).items():
+        ids = [object_id for name, object_id in latest if name == model]
+        if ids:
+            columns = field_columns(queryset.model, serializer_class)
+            objects[model] = {
+                values["id"]: values for values in rows(queryset.filter(pk__in=ids), columns)
+            }
+
+    changes = []
+    for (model, object_id), (seq, action) in latest.items():
+        data = objects.get(model, {}).get(object_id)
+        if data is None or action == Change.DELETE:
+            action, data = Change.DELETE, None
+        changes.append(
+            {"seq": seq, "model": model, "id": object_id, "action": action, "data": data}
+        )
+    next_since = entries[-1][0] if entries else since
+    return changes, next_since, more
+
+
+def compact(batch_size=COMPACT_BATCH_SIZE):
+    """
+    Remove the log entries followed by a newer entry of the same object: the
+    feed only sends the last one, so no client loses a change.
+    return: number of entries removed
+    """
+    newer = Change.objects.filter(
+        project_id=OuterRef("project_id"),
+        model=OuterRef("model"),
+        object_id=OuterRef("object_id"),
+        id__gt=OuterRef("id"),
+    )
+    removed = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Change.objects.filter(Exists(newer)).values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return removed
+            # no signal nor relation on the log: a single DELETE statement
+            removed += Change.objects.filter(pk__in=ids).delete()[0]
+
+
+def expire(older_than, batch_size=COMPACT_BATCH_SIZE):
+    """
+    Remove the log entries recorded before older_than, and move the horizon of
+    their projects so the clients synced before them download the project again.
+    return: number of entries removed
+    """
+    removed = 0
+    while True:
+        with transaction.atomic():
+            entries = list(
+                Change.objects.filter(created_time__lt=older_than)
+                .order_by("id")
+                .values_list("id", "project_id")[:batch_size]
+            )
+            if not entries:
+                return removed
+            horizons = {}
+            for seq, project_id in entries:
+                horizons[project_id] = seq
+            # the entries of the projects deleted since have no horizon to keep
+            projects = Project.all_objects.filter(pk__in=horizons).values_list("pk", flat=True)
+            for project_id in projects:
+                seq = horizons[project_id]
+                if not ChangeHorizon.objects.filter(project_id=project_id).update(seq=seq):
+                    ChangeHorizon.objects.create(project_id=project_id, seq=seq)
+            removed += Change.objects.filter(pk__in=[seq for seq, _ in entries]).delete()[0]
@@ -0,0 +1,125 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+# Routing of the current request, set by read_from_replicas()
+routing = ContextVar("softdesk_db_routing", default=None)
+
+
+class RequestRouting:
+    def __init__(self, replica):
+        self.replica = replica
+        self.pinned = False
+
+
+def new_routing():
+    """
+    return: the routing of one request on a random SOFTDESK_DATABASE_REPLICAS,
+            None without replicas.
+    """
+    replicas = getattr(settings, "SOFTDESK_DATABASE_REPLICAS", [])
+    return RequestRouting(random.choice(replicas)) if replicas else None
+
+
+@contextmanager
+def read_from_replicas(state=None):
+    """
+    Send the reads made inside the block to one of the SOFTDESK_DATABASE_REPLICAS,
+    until the first write pins them back on the primary.
+    state: routing shared by several blocks (the sub-requests of a batch, see
+    new_routing) so a write pins the ones after it.
+    Nested in another block, the routing of the outer one is kept.
+    """
+    if routing.get() is not None:
+        yield
+        return
+    token = routing.set(state or new_routing())
+    try:
+        yield
+    finally:
+        routing.reset(token)
+
+
+@contextmanager
+def on_primary():
+    """
+    Send the reads made inside the block to the primary, even within
+    read_from_replicas(): authentication and permission checks, whose results
+    are cached across requests, must not see a stale replica.
+    """
+    token = routing.set(None)
+    try:
+        yield
+    finally:
+        routing.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Read / write split of the api:
+        - writes always go to the primary (default) database ;
+        - reads go to a replica only inside read_from_replicas(), i.e. the
+          safe-method requests of the api viewsets (see mixins.ReplicaReadMixin),
+          and stay on the primary after a write so a request reads its own writes ;
+        - related objects are read from the database of their instance.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        state = routing.get()
+        if state is None or state.pinned:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = routing.get()
+        if state is not None:
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def delete_rows(rows):
+    """
+    Remove the rows of a queryset with one DELETE ... WHERE pk IN (SELECT ...)
+    statement, on the primary. Unlike QuerySet.delete(), the rows are not loaded:
+    no delete signals are sent and nothing cascades, so the caller deletes the
+    related rows first and does what the signals would have done, e.g. calling
+    signals.invalidate_memberships for the contributors.
+    return: number of rows deleted
+    """
+    model = rows.model
+    connection = connections[router.db_for_write(model)]
+    sql, params = rows.values("pk").query.sql_with_params()
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({sql})", params)
+        return cursor.rowcount
+
+
+def apply_sqlite_profile(connection):
+    """
+    Apply SOFTDESK_SQLITE_PRAGMAS to a new SQLite connection.
+    The raw connection is used so the pragmas are not counted as request queries.
+    """
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SOFTDESK_SQLITE_PRAGMAS", {})
+    cursor = connection.connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
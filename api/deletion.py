@@ -0,0 +1,126 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import changes, stats
+from .db import delete_rows
+from .models import (
+    ArchivedComment,
+    ArchivedIssue,
+    AssigneeStats,
+    Change,
+    ChangeHorizon,
+    Comment,
+    Contributor,
+    Issue,
+    Project,
+    ProjectStats,
+)
+from .signals import invalidate_memberships
+
+PURGE_BATCH_SIZE = 1000
+
+
+def soft_delete_project(project):
+    """
+    Hide the project at once: mark it deleted and drop its memberships, so
+    its issues and comments are no longer reachable. The rows are removed by purge().
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        Project.objects.filter(pk=project.pk).update(
+            deleted_time=now, version=F("version") + 1, modified_time=now
+        )
+        members = Contributor.objects.filter(project_id=project.pk)
+        user_ids = list(members.values_list("user_id", flat=True))
+        # no post_delete per membership: the cache is invalidated here
+        delete_rows(members)
+        invalidate_memberships(project.pk, user_ids)
+
+
+def soft_delete_issue(issue):
+    """
+    Mark the issue deleted, its comments are hidden with it.
+    """
+    with transaction.atomic():
+        comment_count = Comment.objects.filter(issue_id=issue.pk).count()
+        if not Issue.objects.filter(pk=issue.pk).update(deleted_time=timezone.now()):
+            return
+        stats.issue_deleted(issue)
+        stats.comments_changed(issue.pk, -comment_count)
+        changes.record(issue.project_id, Change.ISSUE, [issue.pk], Change.DELETE)
+
+
+def purge_steps():
+    """
+    return: [(label, queryset of the rows to remove), ...], children first.
+    """
+    deleted_project = Q(project__deleted_time__isnull=False)
+    return [
+        (
+            "comments",
+            Comment.all_objects.filter(
+                Q(issue__deleted_time__isnull=False)
+                | Q(issue__project__deleted_time__isnull=False)
+            ),
+        ),
+        (
+            "issues",
+            Issue.all_objects.filter(Q(deleted_time__isnull=False) | deleted_project),
+        ),
+        (
+            "archived comments",
+            ArchivedComment.objects.filter(issue__project__deleted_time__isnull=False),
+        ),
+        ("archived issues", ArchivedIssue.objects.filter(deleted_project)),
+        ("contributors", Contributor.objects.filter(deleted_project)),
+        ("changes", Change.objects.filter(deleted_project)),
+        ("change horizons", ChangeHorizon.objects.filter(deleted_project)),
+        ("assignee stats", AssigneeStats.objects.filter(deleted_project)),
+        ("project stats", ProjectStats.objects.filter(deleted_project)),
+        ("projects", Project.all_objects.filter(deleted_time__isnull=False)),
+    ]
+
+
+def forget_memberships(contributors):
+    """
+    Invalidate the cached memberships of contributors deleted without their
+    post_delete signal.
+    """
+    users = defaultdict(list)
+    for project_id, user_id in contributors.values_list("project_id", "user_id"):
+        users[project_id].append(user_id)
+    for project_id, user_ids in users.items():
+        invalidate_memberships(project_id, user_ids)
+
+
+def purge(batch_size=PURGE_BATCH_SIZE, max_batches=None, progress=None):
+    """
+    Remove the soft-deleted projects and issues with their children, in batches
+    of raw DELETE statements (no collector, no signals), one transaction per batch.
+    Stopping at any point is safe: the next run continues with the rows left.
+    progress: called with (label, rows deleted by the batch, total for the label).
+    return: ({label: deleted rows}, True when everything was purged)
+    """
+    deleted = {}
+    batches = 0
+    for label, queryset in purge_steps():
+        deleted[label] = 0
+        while True:
+            if max_batches is not None and batches >= max_batches:
+                return deleted, False
+            with transaction.atomic():
+                ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+                if not ids:
+                    break
+                batch = queryset.model._base_manager.filter(pk__in=ids)
+                if queryset.model is Contributor:
+                    forget_memberships(batch)
+                count = delete_rows(batch)
+            batches += 1
+            deleted[label] += count
+            if progress is not None:
+                progress(label, count, deleted[label])
+    return deleted, True
@@ -0,0 +1,76 @@
+import csv
+import json
+
+from .models import CommentRecord, IssueRecord
+from .serializers import CommentSerializer, IssueDetailSerializer
+from .values import field_columns, rows
+
+
+class Echo:
+    """
+    File-like object handing back what the csv writer writes.
+    """
+
+    def write(self, value):
+        return value
+
+
+def issues_with_comments(project_id):
+    """
+    Yield (issue, [comments]) for every issue of the project, archived ones included.
+    Issues and comments are read with two chunked cursors sorted by issue,
+    so only the comments of the current issue are kept in memory.
+    """
+    issue_columns = field_columns(IssueRecord, IssueDetailSerializer)
+    comment_columns = field_columns(CommentRecord, CommentSerializer)
+    issues = rows(
+        IssueRecord.objects.filter(project_id=project_id).order_by("id"), issue_columns
+    )
+    comments = rows(
+        CommentRecord.objects.filter(issue__project_id=project_id).order_by(
+            "issue_id", "created_time", "id"
+        ),
+        comment_columns,
+    )
+
+    comment = next(comments, None)
+    for issue in issues:
+        issue_comments = []
+        while comment is not None and comment["issue"] == issue["id"]:
+            issue_comments.append(comment)
+            comment = next(comments, None)
+        yield issue, issue_comments
+
+
+def export_ndjson(project_id):
+    """
+    One JSON line per issue, with its comments in "comments".
+    """
+    for issue, comments in issues_with_comments(project_id):
+        yield json.dumps({**issue, "comments": comments}) + "\n"
+
+
+def export_csv(project_id):
+    """
+    One row per comment joined to its issue, issues without comments get one
+    row with empty comment columns.
+    """
+    issue_fields = IssueDetailSerializer.Meta.fields
+    comment_fields = CommentSerializer.Meta.fields
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        [f"issue_{name}" for name in issue_fields]
+        + [f"comment_{name}" for name in comment_fields]
+    )
+    for issue, comments in issues_with_comments(project_id):
+        issue_row = [issue[name] for name in issue_fields]
+        if not comments:
+            yield writer.writerow(issue_row + [""] * len(comment_fields))
+        for comment in comments:
+            yield writer.writerow(issue_row + [comment[name] for name in comment_fields])
+
+
+EXPORTS = {
+    "ndjson": (export_ndjson, "application/x-ndjson"),
+    "csv": (export_csv, "text/csv"),
+}
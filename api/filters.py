@@ -0,0 +1,147 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from rest_framework.exceptions import ValidationError
+
+from .models import Issue
+
+# ?ordering= values, the rank of the choices is used for priority and status
+ISSUE_ORDERING_FIELDS = ["created_time", "id", "title", "priority", "status", "tag"]
+RANKED_FIELDS = {
+    "priority": [Issue.LOW, Issue.MEDIUM, Issue.HIGH],
+    "status": [Issue.TO_DO, Issue.IN_PROGRESS, Issue.DONE],
+}
+FACET_FIELDS = ["status", "priority", "tag"]
+
+
+def split_values(params, name):
+    """
+    return: the values of a filter given as ?name=a,b or ?name=a&name=b.
+    """
+    values = []
+    for value in params.getlist(name):
+        values.extend(item.strip() for item in value.split(",") if item.strip())
+    return values
+
+
+def parse_ids(params, name):
+    values = split_values(params, name)
+    try:
+        return [int(value) for value in values]
+    except ValueError:
+        raise ValidationError({name: ["Expected user ids."]})
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_created_time(queryset, params, name, lookup):
+    """
+    Filter on created_time with an ISO 8601 datetime, or a whole day with a date.
+    """
+    value = params.get(name)
+    if not value:
+        return queryset
+    day = parse_date(value)
+    if day is not None:
+        # a range on the column, which its indexes can serve, instead of __date
+        if lookup == "gte":
+            return queryset.filter(created_time__gte=start_of_day(day))
+        return queryset.filter(created_time__lt=start_of_day(day + timedelta(days=1)))
+    moment = parse_datetime(value)
+    if moment is not None:
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return queryset.filter(**{f"created_time__{lookup}": moment})
+    raise ValidationError({name: ["Expected an ISO 8601 date or datetime."]})
+
+
+def filter_issues(queryset, params):
+    """
+    Filter issues with the query parameters:
+        - status, priority, tag: one or more choices (?status=TO DO,DONE) ;
+        - assignee, author_user: one or more user ids ;
+        - created_after, created_before: ISO 8601 date or datetime, inclusive.
+    Invalid values raise a ValidationError (400 BAD REQUEST).
+    """
+    for name, choices in [
+        ("status", Issue.STATUS_CHOICES),
+        ("priority", Issue.PRIORITY_CHOICES),
+        ("tag", Issue.TAG_CHOICES),
+    ]:
+        values = split_values(params, name)
+        if not values:
+            continue
+        allowed = [choice for choice, _ in choices]
+        unknown = [value for value in values if value not in allowed]
+        if unknown:
+            raise ValidationError({name: [f"Expected one of {', '.join(allowed)}."]})
+        queryset = queryset.filter(**{f"{name}__in": values})
+
+    for name in ["assignee", "author_user"]:
+        ids = parse_ids(params, name)
+        if ids:
+            queryset = queryset.filter(**{f"{name}_id__in": ids})
+
+    queryset = filter_created_time(queryset, params, "created_after", "gte")
+    queryset = filter_created_time(queryset, params, "created_before", "lte")
+    return queryset
+
+
+def order_issues(queryset, params):
+    """
+    Order issues with ?ordering=field,-field among ISSUE_ORDERING_FIELDS,
+    the id is always added last to keep pages stable.
+    """
+    fields = split_values(params, "ordering")
+    if not fields:
+        return queryset
+
+    order_by = []
+    for field in fields:
+        name = field.lstrip("-")
+        if name not in ISSUE_ORDERING_FIELDS:
+            raise ValidationError(
+                {"ordering": [f"Expected some of {', '.join(ISSUE_ORDERING_FIELDS)}."]}
+            )
+        if name in RANKED_FIELDS:
+            rank = f"{name}_rank"
+            queryset = queryset.annotate(
+                **{
+                    rank: Case(
+                        *[
+                            When(**{name: choice}, then=Value(position))
+                            for position, choice in enumerate(RANKED_FIELDS[name])
+                        ],
+                        output_field=IntegerField(),
+                    )
+                }
+            )
+            field = field.replace(name, rank)
+        order_by.append(field)
+    if "id" not in fields and "-id" not in fields:
+        order_by.append("id")
+    return queryset.order_by(*order_by)
+
+
+def issue_facets(queryset):
+    """
+    return: the number of issues per status, priority and tag,
+            computed with a single grouped query.
+    """
+    facets = {
+        field: {choice: 0 for choice, _ in Issue._meta.get_field(field).choices}
+        for field in FACET_FIELDS
+    }
+    groups = queryset.order_by().values(*FACET_FIELDS).annotate(count=Count("id"))
+    total = 0
+    for group in groups:
+        total += group["count"]
+        for field in FACET_FIELDS:
+            counts = facets[field]
+            counts[group[field]] = counts.get(group[field], 0) + group["count"]
+    return {"count": total, **facets}
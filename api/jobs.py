@@ -0,0 +1,223 @@
+import logging
+import random
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# kind: (function, batch), filled by the @handler decorator (see tasks.py)
+HANDLERS = {}
+
+
+def handler(kind, batch=False):
+    """
+    Register the function running the jobs of a kind. A batch handler is called
+    once with the payloads of every claimed job of its kind, others once per job.
+    A handler raising an exception has its job(s) retried later. A batch handler
+    can also return {index of a payload: exception} for the payloads it could not
+    handle: only their jobs are retried, the others are done.
+    """
+
+    def register(function):
+        HANDLERS[kind] = (function, batch)
+        return function
+
+    return register
+
+
+def enqueue(jobs):
+    """
+    Queue jobs given as (kind, payload), with one insert once the current
+    transaction commits (at once outside of a transaction), so a worker never
+    runs a job for a write that is rolled back or not visible yet.
+    """
+    jobs = [Job(kind=kind, payload=payload) for kind, payload in jobs]
+    if jobs:
+        transaction.on_commit(lambda: Job.objects.bulk_create(jobs))
+
+
+def ready_jobs(now):
+    """
+    return: the queued jobs due to run and the running ones whose worker
+            did not finish in time (crashed or killed).
+    """
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_after__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim(worker, limit):
+    """
+    Lock up to limit ready jobs for the worker, with one UPDATE: it takes the
+    database write lock on SQLite, and the subquery skips the rows locked by
+    other workers where SELECT ... FOR UPDATE SKIP LOCKED is supported.
+    return: the claimed jobs
+    """
+    now = timezone.now()
+    max_attempts = getattr(settings, "SOFTDESK_JOB_MAX_ATTEMPTS", 5)
+    lease = timedelta(seconds=getattr(settings, "SOFTDESK_JOB_LEASE", 300))
+    token = f"{worker}:{uuid.uuid4().hex[:12]}"
+    with transaction.atomic():
+        # a job that keeps killing its worker is not claimed again forever
+        Job.objects.filter(
+            status=Job.RUNNING, locked_until__lt=now, attempts__gte=max_attempts
+        ).update(status=Job.FAILED, last_error="The worker did not finish the job in time.")
+        candidates = ready_jobs(now).order_by("run_after", "id")
+        if connections[DEFAULT_DB_ALIAS].features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ready_jobs(now).filter(pk__in=candidates.values("pk")[:limit]).update(
+            status=Job.RUNNING,
+            locked_by=token,
+            locked_until=now + lease,
+            attempts=F("attempts") + 1,
+        )
+    return list(Job.objects.filter(status=Job.RUNNING, locked_by=token).order_by("id"))
+
+
+def retry_delay(attempts):
+    """
+    return: seconds before the next attempt, doubled after each failure
+            (SOFTDESK_JOB_RETRY_DELAY for the first retry) with some jitter.
+    """
+    delay = getattr(settings, "SOFTDESK_JOB_RETRY_DELAY", 10) * 2 ** (attempts - 1)
+    delay = min(delay, getattr(settings, "SOFTDESK_JOB_MAX_RETRY_DELAY", 3600))
+    return delay * random.uniform(0.75, 1.0)
+
+
+def failed(jobs, error):
+    """
+    Retry the jobs later, or mark them failed after SOFTDESK_JOB_MAX_ATTEMPTS.
+    The jobs claimed again by another worker since (lease expired) are left to it.
+    """
+    max_attempts = getattr(settings, "SOFTDESK_JOB_MAX_ATTEMPTS", 5)
+    now = timezone.now()
+    leases = defaultdict(list)
+    for job in jobs:
+        leases[job.locked_by].append(job)
+        job.last_error = error
+        job.locked_by = ""
+        job.locked_until = None
+        if job.attempts >= max_attempts:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.QUEUED
+            job.run_after = now + timedelta(seconds=retry_delay(job.attempts))
+    for token, leased in leases.items():
+        Job.objects.filter(locked_by=token).bulk_update(
+            leased, ["status", "run_after", "locked_by", "locked_until", "last_error"]
+        )
+
+
+def run(jobs):
+    """
+    Run claimed jobs, the similar ones together for the batch handlers.
+    return: number of jobs done
+    """
+    by_kind = defaultdict(list)
+    for job in jobs:
+        by_kind[job.kind].append(job)
+
+    done = 0
+    for kind, kind_jobs in by_kind.items():
+        if kind not in HANDLERS:
+            failed(kind_jobs, f"No handler for the {kind} jobs.")
+            continue
+        function, batch = HANDLERS[kind]
+        groups = [kind_jobs] if batch else [[job] for job in kind_jobs]
+        for group in groups:
+            errors = {}
+            try:
+                if batch:
+                    errors = function([job.payload for job in group]) or {}
+                else:
+                    function(group[0].payload)
+            except Exception as error:
+                logger.exception("%s job(s) %s failed", kind, [job.pk for job in group])
+                failed(group, describe(error))
+                continue
+            for index, error in errors.items():
+                logger.error("%s job %s failed: %s", kind, group[index].pk, describe(error))
+                failed([group[index]], describe(error))
+            finished = [job for index, job in enumerate(group) if index not in errors]
+            # a job claimed again by another worker since is not ours to delete
+            for token in {job.locked_by for job in finished}:
+                Job.objects.filter(
+                    pk__in=[job.pk for job in finished if job.locked_by == token],
+                    locked_by=token,
+                ).delete()
+            done += len(finished)
+    return done
+
+
+def describe(error):
+    return f"{type(error).__name__}: {error}"
+
+
+def work(worker, batch_size, poll_interval, stop, on_done=None, once=False):
+    """
+    Claim and run jobs until stop (a threading or multiprocessing Event) is set,
+    or until no job is ready when once is True.
+    on_done: called with the number of jobs done after each batch.
+    """
+    try:
+        while not stop.is_set():
+            jobs = claim(worker, batch_size)
+            if not jobs:
+                if once:
+                    return
+                stop.wait(poll_interval)
+                continue
+            done = run(jobs)
+            if on_done is not None:
+                on_done(done)
+    finally:
+        connections.close_all()
+
+
+def work_in_threads(name, threads, *args, **kwargs):
+    """
+    Run work() in threads, each one with its own database connection.
+    """
+    workers = [
+        threading.Thread(
+            target=work, args=(f"{name}-{number}", *args), kwargs=kwargs, daemon=True
+        )
+        for number in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def queue_depth():
+    """
+    return: {"ready": ..., "delayed": ..., "running": ..., "failed": ...}, one query.
+    """
+    now = timezone.now()
+    return Job.objects.aggregate(
+        ready=Count("id", filter=Q(status=Job.QUEUED, run_after__lte=now)),
+        delayed=Count("id", filter=Q(status=Job.QUEUED, run_after__gt=now)),
+        running=Count("id", filter=Q(status=Job.RUNNING)),
+        failed=Count("id", filter=Q(status=Job.FAILED)),
+    )
+
+
+def retry_failed():
+    """
+    Queue the failed jobs again with a fresh number of attempts.
+    return: number of jobs queued
+    """
+    return Job.objects.filter(status=Job.FAILED).update(
+        status=Job.QUEUED, attempts=0, run_after=timezone.now(), last_error=""
+    )
@@ -0,0 +1,150 @@
+import asyncio
+import io
+import json
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+
+from rest_framework.exceptions import (
+    AuthenticationFailed,
+    MethodNotAllowed,
+    NotAuthenticated,
+    PermissionDenied,
+)
+
+from authentication.authentication import StatelessJWTAuthentication
+
+from . import changes, pubsub
+from .cache import membership_cache
+
+EVENTS_PATH = re.compile(r"^/projects/(?P<project_id>[0-9]+)/events/$")
+
+
+def live_events(application):
+    """
+    return: an ASGI application serving GET /projects/<id>/events/ with
+            ProjectEvents and the other requests with application.
+    """
+    events = ProjectEvents()
+
+    async def route(scope, receive, send):
+        if scope["type"] == "http":
+            match = EVENTS_PATH.match(scope["path"])
+            if match:
+                return await events(scope, receive, send, int(match["project_id"]))
+        return await application(scope, receive, send)
+
+    return route
+
+
+class ProjectEvents:
+    """
+    Server-Sent Events stream of the changes of a project, for its contributors:
+        - authenticated with the JWT of the api, the membership is checked
+          at subscribe time as by IsContributor ;
+        - the first event ("ready") gives the change log token the stream starts
+          from, then each change is a "change" event whose id is its token ;
+        - a comment line is sent every SOFTDESK_LIVE_HEARTBEAT seconds of silence ;
+        - a connection that does not read its events fast enough is evicted
+          when SOFTDESK_LIVE_BUFFER_SIZE of them are waiting ("evicted" event).
+    The clients catch up after a reconnection with /projects/<id>/changes/?since=
+    the last event id they received.
+    """
+
+    def authorize(self, scope, project_id):
+        """
+        return: (status, body) of the refusal, or (None, change log token)
+        """
+        close_old_connections()
+        try:
+            request = ASGIRequest(scope, io.BytesIO())
+            try:
+                authenticated = StatelessJWTAuthentication().authenticate(request)
+            except AuthenticationFailed as error:
+                detail = error.detail
+                return 401, detail if isinstance(detail, dict) else {"detail": detail}
+            if authenticated is None:
+                return 401, {"detail": str(NotAuthenticated.default_detail)}
+            user = authenticated[0]
+            if not membership_cache.is_contributor(user.id, project_id):
+                return 403, {"detail": str(PermissionDenied.default_detail)}
+            return None, changes.current_sequence()
+        finally:
+            close_old_connections()
+
+    async def __call__(self, scope, receive, send, project_id):
+        if scope["method"] != "GET":
+            detail = MethodNotAllowed(scope["method"]).detail
+            return await self.refuse(send, 405, {"detail": str(detail)})
+        backend = pubsub.get_backend()
+        buffer_size = getattr(settings, "SOFTDESK_LIVE_BUFFER_SIZE", 100)
+        # subscribed before reading the token, no change can fall in between
+        subscription = backend.subscribe(pubsub.project_channel(project_id), buffer_size)
+        try:
+            status, result = await sync_to_async(self.authorize)(scope, project_id)
+            if status is not None:
+                return await self.refuse(send, status, result)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            await self.write(send, format_event("ready", {"since": result}, result))
+            streaming = asyncio.ensure_future(self.stream(send, subscription))
+            disconnect = asyncio.ensure_future(wait_disconnect(receive))
+            done, pending = await asyncio.wait(
+                {streaming, disconnect}, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in pending:
+                task.cancel()
+            if streaming in done:
+                streaming.result()
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            backend.unsubscribe(subscription)
+
+    async def stream(self, send, subscription):
+        heartbeat = getattr(settings, "SOFTDESK_LIVE_HEARTBEAT", 15)
+        while True:
+            event = await subscription.get(heartbeat)
+            if event is None:
+                await self.write(send, b": heartbeat\n\n")
+            elif event is pubsub.EVICTED:
+                detail = "Too many events were waiting, sync with the changes and reconnect."
+                await self.write(send, format_event("evicted", {"detail": detail}))
+                return
+            else:
+                await self.write(send, format_event("change", event, event["seq"]))
+
+    @staticmethod
+    async def write(send, body):
+        await send({"type": "http.response.body", "body": body, "more_body": True})
+
+    @staticmethod
+    async def refuse(send, status, body):
+        headers = [(b"content-type", b"application/json")]
+        if status == 401:
+            headers.append((b"www-authenticate", b'Bearer realm="api"'))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+
+async def wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def format_event(name, data, event_id=None):
+    lines = [f"event: {name}", f"data: {json.dumps(data)}"]
+    if event_id is not None:
+        lines.insert(0, f"id: {event_id}")
+    return ("\n".join(lines) + "\n\n").encode()
@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the closed issues older than SOFTDESK_ARCHIVE_AFTER_DAYS with their "
+        "comments to the archive tables, in bounded batches. Safe to interrupt: "
+        "a new run continues where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "SOFTDESK_ARCHIVE_AFTER_DAYS", 90),
+            help="archive the closed issues created more than this many days ago",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=archive.ARCHIVE_BATCH_SIZE, help="issues per batch"
+        )
+        parser.add_argument(
+            "--max-batches", type=int, help="stop after this many batches (default: no limit)"
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0.0, help="seconds to sleep between batches"
+        )
+
+    def handle(self, *args, **options):
+        pause = options["pause"]
+
+        def progress(count, total):
+            self.stdout.write(f"{count} issues archived ({total} so far)")
+            if pause:
+                time.sleep(pause)
+
+        archived, done = archive.archive(
+            older_than=timezone.now() - timedelta(days=options["days"]),
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+            progress=progress,
+        )
+        if done:
+            self.stdout.write(self.style.SUCCESS(f"Archive done: {archived} issues archived."))
+        else:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Archive paused after {archived} issues, run it again to continue."
+                )
+            )
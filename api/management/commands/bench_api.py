@@ -0,0 +1,228 @@
+import json
+import time
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from authentication.models import User
+from authentication.serializers import LoginSerializer
+from api.cache import membership_cache, response_cache
+from api.middleware import QueryRecorder, query_stats
+from api.models import Comment, Contributor, Issue
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))
+    return values[rank]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every route of api/urls.py and authentication/urls.py with the "
+        "Django test client and print latency, queries and throughput as JSON. "
+        "Every request runs in a rolled back transaction so the data is left untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="timed requests per route")
+        parser.add_argument("--warmup", type=int, default=5, help="untimed requests per route")
+        parser.add_argument("--user", help="email of the benchmarked user (default: author of the biggest project)")
+        parser.add_argument("--password", default="softdesk", help="password used for the login routes")
+        parser.add_argument("--route", action="append", help="only run these route names")
+        parser.add_argument("--output", help="also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        self.password = options["password"]
+        author = self.pick_author(options["user"])
+        project_id = author.project_id
+        user = author.user
+        issues = Issue.objects.filter(project_id=project_id)
+        issue = (
+            issues.filter(author_user=user).first()
+            or issues.annotate(comments=Count("comment")).order_by("-comments").first()
+        )
+        if issue is None:
+            raise CommandError(f"Project {project_id} has no issue, run seed_softdesk first.")
+        comments = Comment.objects.filter(issue__project_id=project_id)
+        comment = comments.filter(author_user=user).first() or comments.first()
+        if comment is None:
+            raise CommandError(f"Project {project_id} has no comment, run seed_softdesk first.")
+        contributor = Contributor.objects.filter(project_id=project_id).last()
+        outsider = User.objects.exclude(contributions=project_id).first() or user
+
+        refresh = LoginSerializer.get_token(user)
+        self.client = Client(
+            SERVER_NAME="localhost", HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}"
+        )
+        routes = self.routes(
+            user, outsider, project_id, issue, comment, contributor, refresh
+        )
+        if options["route"]:
+            routes = [route for route in routes if route[0] in options["route"]]
+
+        report = {
+            "user": user.email,
+            "project": project_id,
+            "issue": issue.id,
+            "requests_per_route": options["requests"],
+            "routes": {},
+        }
+        for name, method, path, data in routes:
+            report["routes"][name] = self.run_route(
+                method, path, data, options["requests"], options["warmup"]
+            )
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+
+    def pick_author(self, email):
+        authors = Contributor.objects.filter(role=Contributor.AUTHOR).select_related("user")
+        if email:
+            authors = authors.filter(user__email=email)
+        author = (
+            authors.annotate(issues=Count("project__issue"))
+            .order_by("-issues")
+            .first()
+        )
+        if author is None:
+            raise CommandError("No project author found, run seed_softdesk first.")
+        return author
+
+    def routes(self, user, outsider, project_id, issue, comment, contributor, refresh):
+        """
+        return: [(name, method, path, data), ...]
+        `outsider` is a user who is not yet a contributor of the project.
+        """
+        project = {"project_id": project_id}
+        comments = {"project_id": project_id, "issue_id": comment.issue_id}
+        new_issue = {
+            "title": "Benchmark issue",
+            "description": "Benchmark issue",
+            "tag": Issue.BUG,
+            "priority": Issue.LOW,
+            "status": Issue.TO_DO,
+            "assignee": "",
+        }
+        filters = urlencode(
+            {
+                "status": f"{Issue.TO_DO},{Issue.IN_PROGRESS}",
+                "priority": Issue.HIGH,
+                "ordering": "-priority",
+            }
+        )
+        new_comment = {
+            "description": "Benchmark comment",
+            "author_user": user.id,
+            "issue": comment.issue_id,
+        }
+        # the issues of a page and the comments of each of them
+        issues = reverse("issues-list", kwargs=project)
+        batch = {
+            "requests": [
+                {"id": "issues", "method": "GET", "path": issues},
+                {"id": "comments", "method": "GET", "path": issues + "{issues.results.*.id}/comments/"},
+            ]
+        }
+        return [
+            ("projects-list", "get", reverse("projects-list"), None),
+            ("projects-create", "post", reverse("projects-list"), {"title": "Benchmark", "description": "Benchmark", "type": "iOS"}),
+            ("projects-detail", "get", reverse("projects-detail", args=[project_id]), None),
+            ("projects-update", "patch", reverse("projects-detail", args=[project_id]), {"title": "Benchmark"}),
+            ("projects-delete", "delete", reverse("projects-detail", args=[project_id]), None),
+            ("projects-stats", "get", reverse("projects-stats", args=[project_id]), None),
+            ("projects-changes", "get", reverse("projects-changes", kwargs=project) + "?since=0", None),
+            ("contributors-list", "get", reverse("contributors-list", kwargs=project), None),
+            ("contributors-create", "post", reverse("contributors-list", kwargs=project), {"user": outsider.id, "project": project_id, "role": Contributor.CONTRIBUTOR}),
+            ("contributors-detail", "get", reverse("contributors-detail", kwargs={**project, "pk": contributor.id}), None),
+            ("contributors-delete", "delete", reverse("contributors-detail", kwargs={**project, "pk": contributor.id}), None),
+            ("contributors-bulk-add", "post", reverse("contributors-bulk", kwargs=project), {"user_ids": [outsider.id]}),
+            ("contributors-bulk-remove", "delete", reverse("contributors-bulk", kwargs=project), {"user_ids": [contributor.user_id]}),
+            ("issues-list", "get", reverse("issues-list", kwargs=project), None),
+            ("issues-list-filtered", "get", reverse("issues-list", kwargs=project) + "?" + filters, None),
+            ("issues-facets", "get", reverse("issues-facets", kwargs=project), None),
+            ("issues-create", "post", reverse("issues-list", kwargs=project), new_issue),
+            ("issues-bulk-create", "post", reverse("issues-list", kwargs=project), [new_issue] * 20),
+            ("issues-detail", "get", reverse("issues-detail", kwargs={**project, "pk": issue.id}), None),
+            ("issues-update", "patch", reverse("issues-detail", kwargs={**project, "pk": issue.id}), {"title": "Benchmark"}),
+            ("issues-delete", "delete", reverse("issues-detail", kwargs={**project, "pk": issue.id}), None),
+            ("comments-list", "get", reverse("comments-list", kwargs=comments), None),
+            ("comments-create", "post", reverse("comments-list", kwargs=comments), new_comment),
+            ("comments-detail", "get", reverse("comments-detail", kwargs={**comments, "pk": comment.id}), None),
+            ("comments-update", "patch", reverse("comments-detail", kwargs={**comments, "pk": comment.id}), {"description": "Benchmark"}),
+            ("comments-delete", "delete", reverse("comments-detail", kwargs={**comments, "pk": comment.id}), None),
+            ("projects-export", "get", reverse("projects-export", kwargs=project), None),
+            ("projects-export-csv", "get", reverse("projects-export", kwargs=project) + "?output=csv", None),
+            ("search", "get", reverse("search") + "?q=generated", None),
+            ("projects-search", "get", reverse("projects-search", kwargs=project) + "?q=generated", None),
+            ("batch", "post", reverse("batch"), batch),
+            ("token_obtain_pair", "post", reverse("token_obtain_pair"), {"username": user.username, "password": self.password}),
+            ("token_refresh", "post", reverse("token_refresh"), {"refresh": str(refresh)}),
+            ("signup", "post", "/signup/", {"first_name": "Bench", "last_name": "Mark", "username": "benchmark_signup", "email": "benchmark_signup@softdesk.test", "password": "Bench-mark-2022", "password_confirm": "Bench-mark-2022"}),
+        ]
+
+    def run_route(self, method, path, data, requests, warmup):
+        for _ in range(warmup):
+            self.request(method, path, data, QueryRecorder())
+
+        # counters of the timed requests only
+        membership_cache.reset_stats()
+        response_cache.reset_stats()
+        query_stats.reset()
+        durations = []
+        queries = 0
+        statuses = set()
+        for _ in range(requests):
+            recorder = QueryRecorder()
+            duration, status_code = self.request(method, path, data, recorder)
+            durations.append(duration)
+            queries += recorder.count
+            statuses.add(status_code)
+
+        durations.sort()
+        total = sum(durations)
+        return {
+            "method": method.upper(),
+            "path": path,
+            "status": sorted(statuses),
+            "p50_ms": percentile(durations, 50) * 1000,
+            "p95_ms": percentile(durations, 95) * 1000,
+            "p99_ms": percentile(durations, 99) * 1000,
+            "queries_per_request": queries / requests,
+            "requests_per_second": requests / total if total else None,
+            "membership_cache": membership_cache.stats(),
+            "response_cache": response_cache.stats(),
+            # per URL name, from QueryInstrumentationMiddleware
+            "query_stats": query_stats.summary(),
+        }
+
+    def request(self, method, path, data, recorder):
+        """
+        return: (duration in seconds, status code) of one rolled back request.
+        """
+        with transaction.atomic():
+            with connections["default"].execute_wrapper(recorder):
+                start = time.perf_counter()
+                if data is None:
+                    response = getattr(self.client, method)(path)
+                else:
+                    response = getattr(self.client, method)(
+                        path, data, content_type="application/json"
+                    )
+                if response.streaming:
+                    # the rows of a streamed response are read while it is consumed
+                    b"".join(response.streaming_content)
+                duration = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return duration, response.status_code
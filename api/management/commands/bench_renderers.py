@@ -0,0 +1,90 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Issue
+from api.renderers import (
+    FastJSONParser,
+    FastJSONRenderer,
+    MessagePackParser,
+    MessagePackRenderer,
+)
+from api.serializers import IssueDetailSerializer
+from api.values import field_columns, rows
+
+FORMATS = {
+    "json": (JSONRenderer, JSONParser),
+    "fast-json": (FastJSONRenderer, FastJSONParser),
+    "msgpack": (MessagePackRenderer, MessagePackParser),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Render and parse large pages of issues with the DRF JSON renderer, the "
+        "fast JSON renderer and MessagePack (see api/renderers.py), and print the "
+        "timings as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, action="append", help="issues per page (default: 100, 1000 and 5000)")
+        parser.add_argument("--repeat", type=int, default=20, help="runs per format, the best one is kept")
+        parser.add_argument("--output", help="also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        page_sizes = options["page_size"] or [100, 1000, 5000]
+        columns = field_columns(Issue, IssueDetailSerializer)
+        issues = list(rows(Issue.objects.order_by("id")[: max(page_sizes)], columns))
+        if not issues:
+            raise CommandError("No issue, run seed_softdesk first.")
+
+        report = {"repeat": options["repeat"], "pages": {}}
+        for page_size in page_sizes:
+            page = {"count": len(issues), "next": None, "previous": None}
+            page["results"] = issues[:page_size]
+            reference = JSONRenderer().render(page)
+            results = {}
+            for name, (renderer_class, parser_class) in FORMATS.items():
+                if not getattr(renderer_class, "available", True):
+                    results[name] = "not installed"
+                    continue
+                renderer, parser = renderer_class(), parser_class()
+                content, render_seconds = self.best_run(
+                    lambda: renderer.render(page), options["repeat"]
+                )
+                parsed, parse_seconds = self.best_run(
+                    lambda: parser.parse(io.BytesIO(content)), options["repeat"]
+                )
+                results[name] = {
+                    "bytes": len(content),
+                    "render_ms": round(render_seconds * 1000, 3),
+                    "parse_ms": round(parse_seconds * 1000, 3),
+                    "render_mb_per_s": round(len(content) / render_seconds / 1e6, 1),
+                    "round_trip": parsed == json.loads(reference),
+                }
+                if name != "msgpack":
+                    results[name]["identical"] = content == reference
+            report["pages"][len(page["results"])] = results
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+
+    def best_run(self, function, repeat):
+        """
+        return: (result, fastest duration in seconds)
+        """
+        best = None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
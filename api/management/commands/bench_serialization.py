@@ -0,0 +1,81 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Comment, Contributor, Issue
+from api.serializers import (
+    CommentSerializer,
+    ContributorSerializer,
+    IssueDetailSerializer,
+    IssueListSerializer,
+)
+from api.values import field_columns, to_representation
+
+TARGETS = {
+    "issues-list": (Issue, IssueListSerializer),
+    "issues-detail": (Issue, IssueDetailSerializer),
+    "comments": (Comment, CommentSerializer),
+    "contributors": (Contributor, ContributorSerializer),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the rows per second of the serializers and of the values() fast "
+        "path used by the list actions (see mixins.ValuesListMixin), and check "
+        "that both render the same bytes. Prints the report as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="rows read per run")
+        parser.add_argument("--repeat", type=int, default=5, help="runs per path, the best one is kept")
+        parser.add_argument("--target", action="append", choices=list(TARGETS), help="only run these targets")
+        parser.add_argument("--output", help="also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        report = {"rows": options["rows"], "repeat": options["repeat"], "targets": {}}
+        for name in options["target"] or TARGETS:
+            model, serializer_class = TARGETS[name]
+            queryset = model.objects.order_by("id")[: options["rows"]]
+            columns = field_columns(model, serializer_class)
+
+            def serializer_path():
+                return serializer_class(list(queryset), many=True).data
+
+            def values_path():
+                attnames = [attname for _, attname, _ in columns]
+                return [to_representation(values, columns) for values in queryset.values(*attnames)]
+
+            serialized, serializer_seconds = self.best_run(serializer_path, options["repeat"])
+            rows, values_seconds = self.best_run(values_path, options["repeat"])
+            if not rows:
+                raise CommandError(f"No {name} rows, run seed_softdesk first.")
+            renderer = JSONRenderer()
+            report["targets"][name] = {
+                "rows": len(rows),
+                "serializer_rows_per_s": round(len(rows) / serializer_seconds),
+                "values_rows_per_s": round(len(rows) / values_seconds),
+                "speedup": round(serializer_seconds / values_seconds, 2),
+                "identical": renderer.render(serialized) == renderer.render(rows),
+            }
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+
+    def best_run(self, function, repeat):
+        """
+        return: (result, fastest duration in seconds)
+        """
+        best = None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact the change log of the projects (keep the last entry of each "
+        "object) and remove the entries older than SOFTDESK_CHANGES_RETENTION_DAYS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "SOFTDESK_CHANGES_RETENTION_DAYS", 30),
+            help="remove the entries recorded more than this many days ago",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=changes.COMPACT_BATCH_SIZE, help="entries per DELETE"
+        )
+
+    def handle(self, *args, **options):
+        compacted = changes.compact(batch_size=options["batch_size"])
+        expired = changes.expire(
+            timezone.now() - timedelta(days=options["days"]),
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Change log compacted: {compacted} superseded and {expired} expired entries removed."
+            )
+        )
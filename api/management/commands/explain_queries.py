@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import User
+from api.models import Comment, Contributor, Issue, Project
+
+
+class Command(BaseCommand):
+    help = "Print the query plan of the main query of every api endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="user id (default: first contributor)")
+        parser.add_argument("--project", type=int, help="project id (default: user's first)")
+        parser.add_argument("--issue", type=int, help="issue id (default: project's first)")
+
+    def handle(self, *args, **options):
+        contributor = Contributor.objects.order_by("id").first()
+        if contributor is None and not (options["user"] and options["project"]):
+            raise CommandError("No contributor found, pass --user and --project.")
+
+        user_id = options["user"] or contributor.user_id
+        project_id = options["project"] or contributor.project_id
+        issue_id = options["issue"] or (
+            Issue.objects.filter(project_id=project_id).values_list("id", flat=True).first()
+        )
+        email = User.objects.filter(id=user_id).values_list("email", flat=True).first()
+
+        queries = {
+            "permissions (IsContributor)": Contributor.objects.filter(
+                project=project_id, user=user_id
+            ),
+            "permissions (IsAuthorProject)": Contributor.objects.filter(
+                project=project_id, user=user_id, role=Contributor.AUTHOR
+            ),
+            "projects-list": Project.objects.filter(
+                contributor_project__user=user_id
+            ).order_by("id"),
+            "contributors-list": Contributor.objects.filter(project_id=project_id),
+            "issues-list": Issue.objects.filter(project_id=project_id).order_by(
+                "created_time", "id"
+            ),
+            "issues-create (assignee lookup)": User.objects.filter(email=email),
+            "comments-list": Comment.objects.filter(issue_id=issue_id).order_by(
+                "created_time", "id"
+            ),
+        }
+
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain())
+            self.stdout.write("")
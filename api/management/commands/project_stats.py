@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import stats
+
+
+class Command(BaseCommand):
+    help = "Verify or rebuild the denormalized project statistics from the issues and comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true", help="rewrite the statistics from scratch"
+        )
+        parser.add_argument(
+            "--project", type=int, action="append", help="only these project ids"
+        )
+
+    def handle(self, *args, **options):
+        project_ids = options["project"]
+        if options["rebuild"]:
+            stats.rebuild(project_ids)
+            self.stdout.write(self.style.SUCCESS("Project statistics rebuilt."))
+            return
+
+        differences = stats.drift(project_ids)
+        for key, stored, computed in sorted(differences, key=str):
+            self.stdout.write(f"{key}: stored {stored}, expected {computed}")
+        if differences:
+            raise CommandError(
+                f"{len(differences)} statistics drifted, run with --rebuild to fix them."
+            )
+        self.stdout.write(self.style.SUCCESS("Project statistics are up to date."))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import deletion
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove the soft-deleted projects and issues with their children, in "
+        "bounded batches. Safe to interrupt: a new run continues where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=deletion.PURGE_BATCH_SIZE, help="rows per DELETE"
+        )
+        parser.add_argument(
+            "--max-batches", type=int, help="stop after this many batches (default: no limit)"
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0.0, help="seconds to sleep between batches"
+        )
+
+    def handle(self, *args, **options):
+        pause = options["pause"]
+
+        def progress(label, count, total):
+            self.stdout.write(f"{label}: {count} deleted ({total} so far)")
+            if pause:
+                time.sleep(pause)
+
+        deleted, done = deletion.purge(
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+            progress=progress,
+        )
+        summary = ", ".join(f"{count} {label}" for label, count in deleted.items() if count)
+        if done:
+            self.stdout.write(self.style.SUCCESS(f"Purge done: {summary or 'nothing to purge'}."))
+        else:
+            self.stdout.write(
+                self.style.WARNING(f"Purge paused after {summary}, run it again to continue.")
+            )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of the issues and comments."
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The search index needs SQLite (FTS5).")
+        with transaction.atomic():
+            search.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT kind, COUNT(*) FROM api_search GROUP BY kind")
+            for kind, count in cursor.fetchall():
+                self.stdout.write(f"{count} {kind}s indexed")
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
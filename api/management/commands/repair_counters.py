@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from api import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the issue counters of the projects and the comment counters "
+        "of the issues from the rows, and fix the ones that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project", type=int, action="append", help="only these project ids"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=stats.COUNTERS_BATCH_SIZE,
+            help="rows checked per transaction",
+        )
+
+    def handle(self, *args, **options):
+        fixed = stats.repair_counters(options["project"], batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Counters repaired: "
+                + ", ".join(f"{count} {label}" for label, count in fixed.items())
+                + " fixed."
+            )
+        )
@@ -0,0 +1,107 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the background jobs queued in the database (see api/jobs.py) with "
+        "a pool of processes and threads, and report the queue depth and throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1, help="worker processes")
+        parser.add_argument("--threads", type=int, default=2, help="worker threads per process")
+        parser.add_argument(
+            "--batch-size", type=int, default=50, help="jobs claimed at once by a worker"
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=1.0, help="seconds to wait when the queue is empty"
+        )
+        parser.add_argument(
+            "--report-interval", type=float, default=10.0, help="seconds between two reports"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="stop when no job is ready instead of waiting"
+        )
+        parser.add_argument(
+            "--retry-failed", action="store_true", help="queue the failed jobs again first"
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] < 1 or options["threads"] < 1:
+            raise CommandError("Run at least one process and one thread.")
+        if options["retry_failed"]:
+            self.stdout.write(f"{jobs.retry_failed()} failed jobs queued again.")
+
+        done = multiprocessing.Value("q", 0)
+        stop = multiprocessing.Event()
+
+        def on_done(count):
+            with done.get_lock():
+                done.value += count
+
+        work_args = (
+            options["threads"],
+            options["batch_size"],
+            options["poll_interval"],
+            stop,
+        )
+        work_kwargs = {"on_done": on_done, "once": options["once"]}
+        # the forked processes must not share the connections of the parent
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(
+                target=run_process,
+                args=(f"worker-{number}", *work_args),
+                kwargs=work_kwargs,
+                daemon=True,
+            )
+            for number in range(options["processes"])
+        ]
+        for worker in workers:
+            worker.start()
+        # finish the running batches on SIGTERM as on Ctrl-C
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+        start = last_time = time.monotonic()
+        last_done = 0
+        self.stdout.write(
+            f"{options['processes']} processes x {options['threads']} threads started."
+        )
+        try:
+            while any(worker.is_alive() for worker in workers):
+                for worker in workers:
+                    worker.join(options["report_interval"] / len(workers))
+                now = time.monotonic()
+                if now - last_time >= options["report_interval"]:
+                    self.report(done.value - last_done, now - last_time)
+                    last_time, last_done = now, done.value
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping, the running batches are finished first.")
+            stop.set()
+            for worker in workers:
+                worker.join()
+        self.report(done.value, time.monotonic() - start, total=True)
+
+    def report(self, count, seconds, total=False):
+        depth = jobs.queue_depth()
+        rate = count / seconds if seconds else 0.0
+        self.stdout.write(
+            f"{'total: ' if total else ''}{count} jobs done ({rate:.1f}/s), queue: "
+            + ", ".join(f"{value} {name}" for name, value in depth.items())
+        )
+
+
+def run_process(name, *args, **kwargs):
+    """
+    Worker process: Ctrl-C stops the parent, which sets the stop event.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    jobs.work_in_threads(name, *args, **kwargs)
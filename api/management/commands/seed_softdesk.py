@@ -0,0 +1,165 @@
+import random
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authentication.models import User
+from api import stats
+from api.cache import membership_cache
+from api.models import Comment, Contributor, Issue, Project
+
+
+def skewed_weights(count, skew):
+    """
+    Zipf-like weights: a few items get most of the rows, most get very few.
+    """
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+class Command(BaseCommand):
+    help = "Generate users, projects, contributors, issues and comments for local benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--projects", type=int, default=50)
+        parser.add_argument("--contributors", type=int, default=1000, help="total memberships")
+        parser.add_argument("--issues", type=int, default=10000)
+        parser.add_argument("--comments", type=int, default=30000)
+        parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of the project sizes")
+        parser.add_argument("--password", default="softdesk", help="password of every user")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, help="random seed for reproducible data")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            user_ids = self.create_users(options["users"], options["password"])
+            project_ids = self.create_projects(options["projects"])
+            weights = skewed_weights(len(project_ids), options["skew"])
+            members = self.create_contributors(
+                project_ids, user_ids, weights, options["contributors"]
+            )
+            issues = self.create_issues(members, weights, options["issues"])
+            self.create_comments(issues, members, options["skew"], options["comments"])
+            # bulk inserts send no signal
+            stats.repair_counters(project_ids)
+            stats.rebuild(project_ids)
+
+        for project_id, project_members in members.items():
+            membership_cache.invalidate(project_id, project_members)
+
+        self.stdout.write(self.style.SUCCESS("Seeding done."))
+
+    def report(self, model, count):
+        self.stdout.write(f"{count} {model._meta.verbose_name_plural} created")
+
+    def new_ids(self, model, objects, last_id):
+        """
+        return: ids of the rows inserted after `last_id`, the backend may not
+                return them from bulk_create.
+        """
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.report(model, len(objects))
+        return model.objects.filter(id__gt=last_id).order_by("id")
+
+    def last_id(self, model):
+        return model.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+    def create_users(self, count, password):
+        run = uuid.uuid4().hex[:6]
+        password = make_password(password)
+        users = [
+            User(
+                username=f"seed_{run}_{n}",
+                email=f"seed_{run}_{n}@softdesk.test",
+                first_name="Seed",
+                last_name=f"User {n}",
+                password=password,
+            )
+            for n in range(count)
+        ]
+        last_id = self.last_id(User)
+        return list(self.new_ids(User, users, last_id).values_list("id", flat=True))
+
+    def create_projects(self, count):
+        types = [choice for choice, _ in Project.TYPE_CHOICES]
+        projects = [
+            Project(
+                title=f"Project {n}",
+                description=f"Generated project {n}",
+                type=self.rng.choice(types),
+            )
+            for n in range(count)
+        ]
+        last_id = self.last_id(Project)
+        return list(self.new_ids(Project, projects, last_id).values_list("id", flat=True))
+
+    def create_contributors(self, project_ids, user_ids, weights, count):
+        """
+        Every project gets an author, the remaining memberships follow the skew.
+        return: {project_id: [user_id, ...]} with the author first.
+        """
+        members = {}
+        total_weight = sum(weights)
+        for project_id, weight in zip(project_ids, weights):
+            size = max(1, round(count * weight / total_weight))
+            members[project_id] = self.rng.sample(user_ids, min(size, len(user_ids)))
+
+        contributors = [
+            Contributor(
+                project_id=project_id,
+                user_id=user_id,
+                role=Contributor.AUTHOR if position == 0 else Contributor.CONTRIBUTOR,
+            )
+            for project_id, project_members in members.items()
+            for position, user_id in enumerate(project_members)
+        ]
+        Contributor.objects.bulk_create(contributors, batch_size=self.batch_size)
+        self.report(Contributor, len(contributors))
+        return members
+
+    def create_issues(self, members, weights, count):
+        """
+        return: [(issue_id, project_id), ...]
+        """
+        project_ids = self.rng.choices(list(members), weights=weights, k=count)
+        issues = []
+        for n, project_id in enumerate(project_ids):
+            project_members = members[project_id]
+            issues.append(
+                Issue(
+                    title=f"Issue {n}",
+                    description=f"Generated issue {n}",
+                    priority=self.rng.choice(Issue.PRIORITY_CHOICES)[0],
+                    tag=self.rng.choice(Issue.TAG_CHOICES)[0],
+                    status=self.rng.choice(Issue.STATUS_CHOICES)[0],
+                    author_user_id=self.rng.choice(project_members),
+                    assignee_id=self.rng.choice(project_members),
+                    project_id=project_id,
+                )
+            )
+        last_id = self.last_id(Issue)
+        return list(
+            self.new_ids(Issue, issues, last_id).values_list("id", "project_id")
+        )
+
+    def create_comments(self, issues, members, skew, count):
+        if not issues:
+            return
+        targets = self.rng.choices(
+            issues, weights=skewed_weights(len(issues), skew), k=count
+        )
+        comments = [
+            Comment(
+                description=f"Generated comment {n}",
+                author_user_id=self.rng.choice(members[project_id]),
+                issue_id=issue_id,
+            )
+            for n, (issue_id, project_id) in enumerate(targets)
+        ]
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        self.report(Comment, len(comments))
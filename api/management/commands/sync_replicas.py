@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the SQLite files standing in for "
+        "the SOFTDESK_DATABASE_REPLICAS, with the online backup API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--replica", action="append", help="only copy into these aliases")
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError("The primary database is not SQLite, use its own replication.")
+        replicas = options["replica"] or getattr(settings, "SOFTDESK_DATABASE_REPLICAS", [])
+        if not replicas:
+            raise CommandError("No replica, set SOFTDESK_DATABASE_REPLICAS first.")
+
+        primary.ensure_connection()
+        for alias in replicas:
+            if alias not in settings.DATABASES:
+                raise CommandError(f"Unknown database alias {alias}.")
+            replica = connections[alias]
+            if replica.vendor != "sqlite":
+                raise CommandError(f"{alias} is not a SQLite database.")
+            replica.close()
+            target = sqlite3.connect(replica.settings_dict["NAME"])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f"{alias}: copied from {primary.settings_dict['NAME']}")
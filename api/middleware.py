@@ -0,0 +1,138 @@
+import logging
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from threading import Lock
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting the queries of one request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_sql = None
+        self.slowest_duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if duration >= self.slowest_duration:
+                self.slowest_duration = duration
+                self.slowest_sql = sql
+
+
+class QueryStats:
+    """
+    Rolling in-process summary of the queries per route name.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._routes = defaultdict(self._new_window)
+
+    @staticmethod
+    def _new_window():
+        return deque(maxlen=getattr(settings, "SOFTDESK_QUERY_STATS_WINDOW", 500))
+
+    def add(self, route, recorder):
+        with self._lock:
+            self._routes[route].append(
+                (recorder.count, recorder.duration, recorder.slowest_sql)
+            )
+
+    def summary(self):
+        """
+        return: for each route, the number of requests in the window with the
+                average and max query count and DB time (ms), and the slowest statement.
+        """
+        with self._lock:
+            routes = {route: list(samples) for route, samples in self._routes.items()}
+
+        summary = {}
+        for route, samples in routes.items():
+            counts = [count for count, _, _ in samples]
+            durations = [duration for _, duration, _ in samples]
+            slowest = max(samples, key=lambda sample: sample[1])
+            summary[route] = {
+                "requests": len(samples),
+                "queries_avg": sum(counts) / len(counts),
+                "queries_max": max(counts),
+                "db_time_avg_ms": sum(durations) / len(durations) * 1000,
+                "db_time_max_ms": max(durations) * 1000,
+                "slowest_sql": slowest[2],
+            }
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+query_stats = QueryStats()
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record the query count, DB time and slowest statement of every request:
+        - kept per resolved route name (e.g. issues-list) in `query_stats` ;
+        - sent as X-Query-Count / X-DB-Time-ms headers if SOFTDESK_QUERY_HEADERS ;
+        - checked against the `query_budgets` of the viewset for the action
+          (or `request.query_budget` when a view sets it), logged when exceeded
+          or raised if SOFTDESK_QUERY_BUDGET_STRICT.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        if match is None or not match.url_name:
+            return response
+
+        query_stats.add(match.url_name, recorder)
+        if getattr(settings, "SOFTDESK_QUERY_HEADERS", False):
+            response["X-Query-Count"] = str(recorder.count)
+            response["X-DB-Time-ms"] = f"{recorder.duration * 1000:.2f}"
+
+        self.check_budget(request, match, recorder)
+        return response
+
+    def check_budget(self, request, match, recorder):
+        view_class = getattr(match.func, "cls", None)
+        actions = getattr(match.func, "actions", None) or {}
+        budgets = getattr(view_class, "query_budgets", None) or {}
+        action = actions.get(request.method.lower())
+        # a view can override the budget of one request (None disables the check)
+        budget = getattr(request, "query_budget", budgets.get(action))
+        if budget is None or recorder.count <= budget:
+            return
+        message = (
+            f"{match.url_name} ({action}) ran {recorder.count} queries, "
+            f"budget is {budget}. Slowest: {recorder.slowest_sql}"
+        )
+        if getattr(settings, "SOFTDESK_QUERY_BUDGET_STRICT", False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,47 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+def remove_duplicate_contributors(apps, schema_editor):
+    """
+    Keep one membership per (project, user) before adding the unique constraint,
+    the author one if there is one.
+    """
+    Contributor = apps.get_model("api", "Contributor")
+    kept = set()
+    duplicates = []
+    rows = Contributor.objects.order_by("project_id", "user_id", "role", "id")
+    for pk, project_id, user_id in rows.values_list("id", "project_id", "user_id"):
+        if (project_id, user_id) in kept:
+            duplicates.append(pk)
+        else:
+            kept.add((project_id, user_id))
+    Contributor.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_rename_author_comment_author_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_contributors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['issue', 'created_time'], name='comment_issue_created'),
+        ),
+        migrations.AddIndex(
+            model_name='contributor',
+            index=models.Index(fields=['project', 'user', 'role'], name='contributor_proj_user_role'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'created_time'], name='issue_project_created'),
+        ),
+        migrations.AddConstraint(
+            model_name='contributor',
+            constraint=models.UniqueConstraint(fields=('project', 'user'), name='unique_contributor_project_user'),
+        ),
+    ]
@@ -0,0 +1,114 @@
+from django.db import migrations
+
+# Issues use rowid = 2 * id and comments rowid = 2 * id + 1, so the triggers
+# update the full-text index by rowid instead of scanning it.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE api_search USING fts5(
+        title,
+        body,
+        kind UNINDEXED,
+        object_id UNINDEXED,
+        issue_id UNINDEXED,
+        project_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER api_issue_search_insert AFTER INSERT ON api_issue BEGIN
+        INSERT INTO api_search (rowid, title, body, kind, object_id, issue_id, project_id)
+        VALUES (new.id * 2, new.title, new.description, 'issue', new.id, new.id, new.project_id);
+    END
+    """,
+    """
+    CREATE TRIGGER api_issue_search_update
+    AFTER UPDATE OF title, description, project_id ON api_issue BEGIN
+        DELETE FROM api_search WHERE rowid = old.id * 2;
+        INSERT INTO api_search (rowid, title, body, kind, object_id, issue_id, project_id)
+        VALUES (new.id * 2, new.title, new.description, 'issue', new.id, new.id, new.project_id);
+    END
+    """,
+    """
+    CREATE TRIGGER api_issue_search_move
+    AFTER UPDATE OF project_id ON api_issue WHEN new.project_id != old.project_id BEGIN
+        UPDATE api_search SET project_id = new.project_id
+        WHERE kind = 'comment' AND issue_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER api_issue_search_delete AFTER DELETE ON api_issue BEGIN
+        DELETE FROM api_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER api_comment_search_insert AFTER INSERT ON api_comment BEGIN
+        INSERT INTO api_search (rowid, title, body, kind, object_id, issue_id, project_id)
+        VALUES (
+            new.id * 2 + 1, '', new.description, 'comment', new.id, new.issue_id,
+            (SELECT project_id FROM api_issue WHERE id = new.issue_id)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER api_comment_search_update
+    AFTER UPDATE OF description, issue_id ON api_comment BEGIN
+        DELETE FROM api_search WHERE rowid = old.id * 2 + 1;
+        INSERT INTO api_search (rowid, title, body, kind, object_id, issue_id, project_id)
+        VALUES (
+            new.id * 2 + 1, '', new.description, 'comment', new.id, new.issue_id,
+            (SELECT project_id FROM api_issue WHERE id = new.issue_id)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER api_comment_search_delete AFTER DELETE ON api_comment BEGIN
+        DELETE FROM api_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    INSERT INTO api_search (rowid, title, body, kind, object_id, issue_id, project_id)
+    SELECT id * 2, title, description, 'issue', id, id, project_id FROM api_issue
+    """,
+    """
+    INSERT INTO api_search (rowid, title, body, kind, object_id, issue_id, project_id)
+    SELECT api_comment.id * 2 + 1, '', api_comment.description, 'comment',
+           api_comment.id, api_comment.issue_id, api_issue.project_id
+    FROM api_comment INNER JOIN api_issue ON api_issue.id = api_comment.issue_id
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS api_comment_search_delete",
+    "DROP TRIGGER IF EXISTS api_comment_search_update",
+    "DROP TRIGGER IF EXISTS api_comment_search_insert",
+    "DROP TRIGGER IF EXISTS api_issue_search_delete",
+    "DROP TRIGGER IF EXISTS api_issue_search_move",
+    "DROP TRIGGER IF EXISTS api_issue_search_update",
+    "DROP TRIGGER IF EXISTS api_issue_search_insert",
+    "DROP TABLE IF EXISTS api_search",
+]
+
+
+def run_on_sqlite(statements):
+    """
+    The full-text index relies on SQLite FTS5, other databases are skipped.
+    """
+
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_project_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+STATUS_FIELDS = {"TO DO": "to_do", "IN PROGRESS": "in_progress", "DONE": "done"}
+
+
+def compute_stats(apps, schema_editor):
+    """
+    Fill the statistics of the existing projects.
+    """
+    Issue = apps.get_model("api", "Issue")
+    Comment = apps.get_model("api", "Comment")
+    ProjectStats = apps.get_model("api", "ProjectStats")
+    AssigneeStats = apps.get_model("api", "AssigneeStats")
+
+    projects = {}
+    assignees = {}
+    groups = (
+        Issue.objects.order_by()
+        .values_list("project_id", "assignee_id", "status")
+        .annotate(count=models.Count("id"))
+    )
+    for project_id, assignee_id, status, count in groups:
+        field = STATUS_FIELDS.get(status)
+        if field is None:
+            continue
+        project = projects.setdefault(project_id, ProjectStats(project_id=project_id))
+        setattr(project, field, getattr(project, field) + count)
+        assignee = assignees.setdefault(
+            (project_id, assignee_id),
+            AssigneeStats(project_id=project_id, assignee_id=assignee_id),
+        )
+        setattr(assignee, field, getattr(assignee, field) + count)
+
+    groups = (
+        Comment.objects.order_by()
+        .values_list("issue__project_id")
+        .annotate(count=models.Count("id"))
+    )
+    for project_id, count in groups:
+        project = projects.setdefault(project_id, ProjectStats(project_id=project_id))
+        project.comment_count += count
+
+    ProjectStats.objects.bulk_create(projects.values())
+    AssigneeStats.objects.bulk_create(assignees.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0006_issue_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.project')),
+                ('to_do', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0)),
+                ('comment_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AssigneeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_do', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0)),
+                ('assignee', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignee_stats', to='api.project')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='assigneestats',
+            constraint=models.UniqueConstraint(fields=('project', 'assignee'), name='unique_assignee_stats'),
+        ),
+        migrations.RunPython(compute_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:44
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# SQLite rebuilds api_issue to add a column, which fails while the full-text
+# index triggers reference it: they are dropped and created again around it.
+search_index = import_module("api.migrations.0005_search_index")
+CREATE_TRIGGERS = [sql for sql in search_index.CREATE_SQL if "CREATE TRIGGER" in sql]
+DROP_TRIGGERS = [sql for sql in search_index.DROP_SQL if "TRIGGER" in sql]
+run_on_sqlite = search_index.run_on_sqlite
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_project_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(DROP_TRIGGERS), run_on_sqlite(CREATE_TRIGGERS)),
+        migrations.AddField(
+            model_name='issue',
+            name='deleted_time',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='deleted_time',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(condition=models.Q(('deleted_time__isnull', False)), fields=['deleted_time'], name='issue_deleted'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('deleted_time__isnull', False)), fields=['deleted_time'], name='project_deleted'),
+        ),
+        migrations.RunPython(run_on_sqlite(CREATE_TRIGGERS), run_on_sqlite(DROP_TRIGGERS)),
+    ]
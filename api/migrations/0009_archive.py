@@ -0,0 +1,104 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# IssueRecord and CommentRecord read these views. SQLite checks the views when
+# a table is rebuilt: a later migration changing api_issue, api_comment or
+# their archives drops them first and creates them again afterwards.
+CREATE_SQL = [
+    """
+    CREATE VIEW api_issue_record AS
+    SELECT id, title, description, priority, tag, status, created_time,
+           author_user_id, assignee_id, project_id, deleted_time, FALSE AS archived
+    FROM api_issue
+    UNION ALL
+    SELECT id, title, description, priority, tag, status, created_time,
+           author_user_id, assignee_id, project_id, NULL AS deleted_time, TRUE AS archived
+    FROM api_archivedissue
+    """,
+    """
+    CREATE VIEW api_comment_record AS
+    SELECT id, description, created_time, author_user_id, issue_id FROM api_comment
+    UNION ALL
+    SELECT id, description, created_time, author_user_id, issue_id FROM api_archivedcomment
+    """,
+]
+DROP_SQL = ["DROP VIEW IF EXISTS api_comment_record", "DROP VIEW IF EXISTS api_issue_record"]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0008_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=128)),
+                ('created_time', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'api_comment_record',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='IssueRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=128)),
+                ('description', models.TextField(max_length=1000)),
+                ('priority', models.CharField(choices=[('LOW', 'Faible'), ('MEDIUM', 'Moyenne'), ('HIGH', 'Élevée')], max_length=128)),
+                ('tag', models.CharField(choices=[('BUG', 'Bug'), ('IMPROVE', 'Amélioration'), ('TASK', 'Tâche')], max_length=128)),
+                ('status', models.CharField(choices=[('TO DO', 'À faire'), ('IN PROGRESS', 'En cours'), ('DONE', 'Terminé')], max_length=128)),
+                ('created_time', models.DateTimeField()),
+                ('deleted_time', models.DateTimeField(null=True)),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'api_issue_record',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedIssue',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=128)),
+                ('description', models.TextField(max_length=1000)),
+                ('priority', models.CharField(choices=[('LOW', 'Faible'), ('MEDIUM', 'Moyenne'), ('HIGH', 'Élevée')], max_length=128)),
+                ('tag', models.CharField(choices=[('BUG', 'Bug'), ('IMPROVE', 'Amélioration'), ('TASK', 'Tâche')], max_length=128)),
+                ('status', models.CharField(choices=[('TO DO', 'À faire'), ('IN PROGRESS', 'En cours'), ('DONE', 'Terminé')], max_length=128)),
+                ('created_time', models.DateTimeField()),
+                ('archived_time', models.DateTimeField()),
+                ('assignee', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('author_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_issues', to='api.project')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('description', models.CharField(max_length=128)),
+                ('created_time', models.DateTimeField()),
+                ('author_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.archivedissue')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedissue',
+            index=models.Index(fields=['project', 'created_time'], name='archived_issue_project'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcomment',
+            index=models.Index(fields=['issue', 'created_time'], name='archived_comment_issue'),
+        ),
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
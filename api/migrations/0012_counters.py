@@ -0,0 +1,107 @@
+# Generated by Django 4.0.3 on 2026-10-18 18:13
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# api_issue and api_archivedissue are rebuilt by SQLite to add the columns: the
+# full-text index triggers and the record views reading them are dropped first
+# and created again afterwards, the issue record view with the new columns.
+search_index = import_module("api.migrations.0005_search_index")
+archive = import_module("api.migrations.0009_archive")
+CREATE_TRIGGERS = [sql for sql in search_index.CREATE_SQL if "CREATE TRIGGER" in sql]
+DROP_TRIGGERS = [sql for sql in search_index.DROP_SQL if "TRIGGER" in sql]
+run_on_sqlite = search_index.run_on_sqlite
+
+CREATE_VIEWS = [
+    """
+    CREATE VIEW api_issue_record AS
+    SELECT id, title, description, priority, tag, status, created_time,
+           author_user_id, assignee_id, project_id, deleted_time,
+           comment_count, last_comment_time, FALSE AS archived
+    FROM api_issue
+    UNION ALL
+    SELECT id, title, description, priority, tag, status, created_time,
+           author_user_id, assignee_id, project_id, NULL AS deleted_time,
+           comment_count, last_comment_time, TRUE AS archived
+    FROM api_archivedissue
+    """,
+    *[sql for sql in archive.CREATE_SQL if "api_comment_record" in sql],
+]
+
+# the counters of the existing rows, archived issues included as in stats.py
+FILL_COUNTERS_SQL = [
+    """
+    UPDATE api_project SET
+        issue_count = (
+            SELECT COUNT(*) FROM api_issue_record
+            WHERE project_id = api_project.id AND deleted_time IS NULL
+        ),
+        open_issue_count = (
+            SELECT COUNT(*) FROM api_issue_record
+            WHERE project_id = api_project.id AND deleted_time IS NULL AND status != 'DONE'
+        )
+    """,
+    """
+    UPDATE api_issue SET
+        comment_count = (SELECT COUNT(*) FROM api_comment WHERE issue_id = api_issue.id),
+        last_comment_time = (
+            SELECT MAX(created_time) FROM api_comment WHERE issue_id = api_issue.id
+        )
+    """,
+    """
+    UPDATE api_archivedissue SET
+        comment_count = (
+            SELECT COUNT(*) FROM api_archivedcomment WHERE issue_id = api_archivedissue.id
+        ),
+        last_comment_time = (
+            SELECT MAX(created_time) FROM api_archivedcomment
+            WHERE issue_id = api_archivedissue.id
+        )
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_change_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(DROP_TRIGGERS), run_on_sqlite(CREATE_TRIGGERS)),
+        migrations.RunSQL(archive.DROP_SQL, archive.CREATE_SQL),
+        migrations.AddField(
+            model_name='archivedissue',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedissue',
+            name='last_comment_time',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='last_comment_time',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issue_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='open_issue_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(CREATE_VIEWS, archive.DROP_SQL),
+        migrations.RunSQL(FILL_COUNTERS_SQL, migrations.RunSQL.noop),
+        migrations.RunPython(run_on_sqlite(CREATE_TRIGGERS), run_on_sqlite(DROP_TRIGGERS)),
+    ]
@@ -0,0 +1,166 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.http import parse_etags, quote_etag
+
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from .cache import response_cache
+from .db import on_primary, read_from_replicas
+from .models import Project
+from .serializers import sparse_fields
+from .values import field_columns, to_representation
+
+
+class ConditionalGetMixin:
+    """
+    ETag support for the list and retrieve actions:
+        - derived from the version of the project, bumped on every change of
+          the project, its issues, comments or contributors ;
+        - If-None-Match is answered with 304 Not Modified after the permissions
+          but before the serializer, and for retrieve once the object is found
+          (a missing one is still a 404) ;
+        - the actions listed in `cached_actions` are served from the versioned
+          response cache (see cache.ResponseCache) when possible.
+    """
+
+    version_lookup_kwarg = "project_id"
+    cached_actions = ()
+
+    def get_project_version(self):
+        """
+        return: the version of the project, or None.
+        Single primary key lookup.
+        """
+        project_id = self.kwargs.get(self.version_lookup_kwarg)
+        if project_id is None:
+            return None
+        return (
+            Project.objects.filter(pk=project_id)
+            .values_list("version", flat=True)
+            .first()
+        )
+
+    def make_etag(self, request, version):
+        """
+        The ETag also covers the query parameters and the negotiated format.
+        """
+        key = f"{version}:{request.get_full_path()}:{request.accepted_media_type}"
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        version = self.get_project_version()
+        if version is None:
+            return handler(request, *args, **kwargs)
+
+        etag = self.make_etag(request, version)
+        # no If-Modified-Since: several changes can happen within its second
+        if_none_match = request.headers.get("If-None-Match")
+        not_modified = if_none_match is not None and (
+            "*" in if_none_match or etag in parse_etags(if_none_match)
+        )
+        if not_modified and self.action == "retrieve":
+            self.check_object_exists()
+
+        if not_modified:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif self.action in self.cached_actions:
+            response = self.cached_response(request, version, handler, *args, **kwargs)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+        return response
+
+    def check_object_exists(self):
+        """
+        Raise the 404 of retrieve for an object out of the queryset, with an
+        exists() query instead of loading it.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            found = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).exists()
+        except (TypeError, ValueError, ValidationError):
+            found = False
+        if not found:
+            raise Http404
+
+    def cached_response(self, request, version, handler, *args, **kwargs):
+        project_id = self.kwargs.get(self.version_lookup_kwarg)
+        key = response_cache.make_key(self, request, project_id, version)
+        data = response_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response_cache.set(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+
+class ValuesListMixin:
+    """
+    Read-only fast path of the list action:
+        - when every (asked) field of the serializer is a plain column, the
+          page is read with values() and each row turned into the dict the
+          serializer would output, without model instances ;
+        - other serializers, or SOFTDESK_VALUES_FAST_PATH = False, go through
+          the serializer as before.
+    """
+
+    def get_list_columns(self, queryset):
+        if not getattr(settings, "SOFTDESK_VALUES_FAST_PATH", True):
+            return None
+        serializer_class = self.get_serializer_class()
+        names = sparse_fields(self.request, serializer_class.Meta.fields)
+        return field_columns(queryset.model, serializer_class, names)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = self.get_list_columns(queryset)
+        if columns is None:
+            return super().list(request, *args, **kwargs)
+
+        # the cursor pagination reads its position from the rows
+        attnames = {attname for _, attname, _ in columns}
+        attnames.update(getattr(self, "cursor_ordering", None) or ())
+        rows = queryset.prefetch_related(None).values(*attnames)
+        page = self.paginate_queryset(rows)
+        data = [to_representation(values, columns) for values in (rows if page is None else page)]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class ReplicaReadMixin:
+    """
+    Serve the safe-method requests from the read replicas (see db.ReplicaRouter),
+    other requests only use the primary database. The authentication and the
+    permission checks always read from the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replicas():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        with on_primary():
+            super().initial(request, *args, **kwargs)
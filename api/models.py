@@ -1,7 +1,25 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from django_project import settings
 
 
+class LiveManager(models.Manager):
+    """
+    Default manager hiding the soft-deleted rows (see deletion.py),
+    the `all_objects` manager still returns them.
+    """
+
+    live_filter = {"deleted_time__isnull": True}
+
+    def get_queryset(self):
+        return super().get_queryset().filter(**self.live_filter)
+
+
+class LiveCommentManager(LiveManager):
+    live_filter = {"issue__deleted_time__isnull": True}
+
+
 class Project(models.Model):
 
     BACKEND = "BACK-END"
@@ -22,10 +40,59 @@ class Project(models.Model):
     contributor = models.ManyToManyField(
         settings.AUTH_USER_MODEL, through="Contributor", related_name="contributions"
     )
+    # bumped on every change of the project, its issues, comments or contributors
+    version = models.PositiveBigIntegerField(default=1, editable=False)
+    modified_time = models.DateTimeField(default=timezone.now, editable=False)
+    # set by a soft delete, the row is removed later by the purge_deleted command
+    deleted_time = models.DateTimeField(null=True, blank=True, editable=False)
+    # issues of the project (archived ones included) and those not done yet,
+    # maintained with the statistics (see stats.py)
+    issue_count = models.IntegerField(default=0, editable=False)
+    open_issue_count = models.IntegerField(default=0, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["deleted_time"],
+                name="project_deleted",
+                condition=Q(deleted_time__isnull=False),
+            )
+        ]
+
+    # maintained with queryset updates, never written back from a (stale) instance
+    MAINTAINED_FIELDS = [
+        "version",
+        "modified_time",
+        "deleted_time",
+        "issue_count",
+        "open_issue_count",
+    ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bump_version(cls, **lookup):
+        """
+        Increment the version of the projects matching the lookup,
+        e.g. Project.bump_version(pk=1) or Project.bump_version(issue=3).
+        """
+        cls.objects.filter(**lookup).update(
+            version=F("version") + 1, modified_time=timezone.now()
+        )
+
 
 class Contributor(models.Model):
     AUTHOR = "AUTHOR"
@@ -42,9 +109,27 @@ class Contributor(models.Model):
         max_length=30, choices=CHOICES, verbose_name="role"
     )  # add default role if you want
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project", "user"], name="unique_contributor_project_user"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["project", "user", "role"], name="contributor_proj_user_role"
+            )
+        ]
+
     def __str__(self):
         return self.user.email
 
+    def save(self, *args, **kwargs):
+        # the change log entry is recorded by the signals in the same transaction,
+        # the one of the caller if any (no savepoint)
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
 
 class Issue(models.Model):
     LOW = "LOW"
@@ -78,6 +163,56 @@ class Issue(models.Model):
         to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True
     )
     project = models.ForeignKey(to=Project, on_delete=models.CASCADE)
+    # set by a soft delete, the row is removed later by the purge_deleted command
+    deleted_time = models.DateTimeField(null=True, blank=True, editable=False)
+    # maintained by the comment signals (see stats.py)
+    comment_count = models.IntegerField(default=0, editable=False)
+    last_comment_time = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "created_time"], name="issue_project_created"),
+            models.Index(
+                fields=["project", "status", "created_time"], name="issue_project_status"
+            ),
+            models.Index(
+                fields=["project", "priority", "created_time"],
+                name="issue_project_priority",
+            ),
+            models.Index(
+                fields=["project", "assignee", "status"], name="issue_project_assignee"
+            ),
+            models.Index(
+                fields=["deleted_time"],
+                name="issue_deleted",
+                condition=Q(deleted_time__isnull=False),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # kept to know the previous status / assignee / project on update
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    # maintained with queryset updates, never written back from a (stale) instance
+    MAINTAINED_FIELDS = ["deleted_time", "comment_count", "last_comment_time"]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MAINTAINED_FIELDS
+            ]
+        # the statistics are updated by the signals in the same transaction,
+        # the one of the caller if any (no savepoint)
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
 
 
 class Comment(models.Model):
@@ -90,5 +225,232 @@ class Comment(models.Model):
     )
     issue = models.ForeignKey(to=Issue, on_delete=models.CASCADE)
 
+    # the comments of a soft-deleted issue are hidden with it
+    objects = LiveCommentManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["issue", "created_time"], name="comment_issue_created")
+        ]
+
     def __str__(self):
         return self.description[:50]
+
+    def save(self, *args, **kwargs):
+        # the statistics are updated by the signals in the same transaction,
+        # the one of the caller if any (no savepoint)
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class ArchivedIssue(models.Model):
+    """
+    Cold storage of a closed issue moved out of Issue by archive.py,
+    with the same id and columns.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=128)
+    description = models.TextField(max_length=1000)
+    priority = models.CharField(max_length=128, choices=Issue.PRIORITY_CHOICES)
+    tag = models.CharField(max_length=128, choices=Issue.TAG_CHOICES)
+    status = models.CharField(max_length=128, choices=Issue.STATUS_CHOICES)
+    created_time = models.DateTimeField()
+    author_user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    assignee = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    project = models.ForeignKey(
+        to=Project, on_delete=models.CASCADE, related_name="archived_issues"
+    )
+    comment_count = models.IntegerField(default=0)
+    last_comment_time = models.DateTimeField(null=True)
+    archived_time = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["project", "created_time"], name="archived_issue_project"
+            )
+        ]
+
+
+class ArchivedComment(models.Model):
+    """
+    Comment of an archived issue, moved with it.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    description = models.CharField(max_length=128)
+    created_time = models.DateTimeField()
+    author_user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    issue = models.ForeignKey(to=ArchivedIssue, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["issue", "created_time"], name="archived_comment_issue")
+        ]
+
+
+class IssueRecord(models.Model):
+    """
+    Read-only union of the issues and the archived issues (a database view),
+    used by the ?include_archived=1 reads.
+    """
+
+    title = models.CharField(max_length=128)
+    description = models.TextField(max_length=1000)
+    priority = models.CharField(max_length=128, choices=Issue.PRIORITY_CHOICES)
+    tag = models.CharField(max_length=128, choices=Issue.TAG_CHOICES)
+    status = models.CharField(max_length=128, choices=Issue.STATUS_CHOICES)
+    created_time = models.DateTimeField()
+    author_user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, related_name="+"
+    )
+    assignee = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, null=True, related_name="+"
+    )
+    project = models.ForeignKey(to=Project, on_delete=models.DO_NOTHING, related_name="+")
+    deleted_time = models.DateTimeField(null=True)
+    comment_count = models.IntegerField()
+    last_comment_time = models.DateTimeField(null=True)
+    archived = models.BooleanField()
+
+    objects = LiveManager()
+
+    class Meta:
+        managed = False
+        db_table = "api_issue_record"
+
+
+class CommentRecord(models.Model):
+    """
+    Read-only union of the comments and the archived comments (a database view).
+    """
+
+    description = models.CharField(max_length=128)
+    created_time = models.DateTimeField()
+    author_user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, related_name="+"
+    )
+    issue = models.ForeignKey(to=IssueRecord, on_delete=models.DO_NOTHING, related_name="+")
+
+    objects = LiveCommentManager()
+
+    class Meta:
+        managed = False
+        db_table = "api_comment_record"
+
+
+class ProjectStats(models.Model):
+    """
+    Denormalized counters of a project, maintained incrementally (see stats.py).
+    """
+
+    project = models.OneToOneField(
+        Project, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    to_do = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+
+
+class AssigneeStats(models.Model):
+    """
+    Issues of a project per assignee and status, maintained with ProjectStats.
+    """
+
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="assignee_stats"
+    )
+    assignee = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True
+    )
+    to_do = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project", "assignee"], name="unique_assignee_stats"
+            )
+        ]
+
+
+class Job(models.Model):
+    """
+    Background job of the database queue (see jobs.py), run by the
+    run_workers command. Done jobs are deleted, failed ones are kept.
+    """
+
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    FAILED = "FAILED"
+
+    STATUS_CHOICES = [(QUEUED, "queued"), (RUNNING, "running"), (FAILED, "failed")]
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    # claim of the worker running the job, taken back when locked_until is past
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_time = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"], name="job_ready")]
+
+
+class Change(models.Model):
+    """
+    Entry of the change log of a project read by the delta sync clients
+    (see changes.py), its id is the sequence number.
+    """
+
+    ISSUE = "issue"
+    COMMENT = "comment"
+    CONTRIBUTOR = "contributor"
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+    MODEL_CHOICES = [(ISSUE, "issue"), (COMMENT, "comment"), (CONTRIBUTOR, "contributor")]
+    ACTION_CHOICES = [(CREATE, "create"), (UPDATE, "update"), (DELETE, "delete")]
+
+    # without a database constraint, the changes made while a project is being
+    # deleted are still recorded, they are removed with the expired ones
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, db_constraint=False, related_name="+"
+    )
+    model = models.CharField(max_length=16, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=8, choices=ACTION_CHOICES)
+    created_time = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "id"], name="change_project_seq"),
+            models.Index(fields=["project", "model", "object_id"], name="change_object"),
+        ]
+
+
+class ChangeHorizon(models.Model):
+    """
+    Last sequence number of a project removed from the change log by the
+    retention, the clients synced before it must download the project again.
+    """
+
+    project = models.OneToOneField(
+        Project, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    seq = models.PositiveBigIntegerField(default=0)
@@ -0,0 +1,61 @@
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on the view's `cursor_ordering`:
+        - opaque cursors, no OFFSET scan and no COUNT(*) ;
+        - page size can be chosen with ?page_size= up to SOFTDESK_CURSOR_MAX_PAGE_SIZE.
+    """
+
+    page_size_query_param = "page_size"
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, "SOFTDESK_CURSOR_MAX_PAGE_SIZE", 100)
+
+    def get_ordering(self, request, queryset, view):
+        return view.cursor_ordering
+
+
+class SoftDeskPagination(LimitOffsetPagination):
+    """
+    Default pagination of the API.
+    Limit/offset stays the default, cursor pagination is used instead when:
+        - the request asks for it with ?pagination=cursor or sends a ?cursor= ;
+        - the viewset sets `pagination_mode = "cursor"`.
+    Only viewsets declaring a `cursor_ordering` support the cursor mode.
+    """
+
+    mode_query_param = "pagination"
+
+    def __init__(self):
+        self.keyset = None
+
+    def use_cursor(self, request, view):
+        if getattr(view, "cursor_ordering", None) is None:
+            return False
+        mode = request.query_params.get(self.mode_query_param)
+        if mode is not None:
+            return mode == "cursor"
+        if KeysetPagination.cursor_query_param in request.query_params:
+            return True
+        return getattr(view, "pagination_mode", "offset") == "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if view is not None and self.use_cursor(request, view):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response_schema(schema)
+        return super().get_paginated_response_schema(schema)
@@ -1,5 +1,6 @@
 from rest_framework.permissions import BasePermission
-from .models import Contributor, Comment, Issue
+from .cache import membership_cache
+from .models import Comment, Issue
 
 
 class IsAuthorProject(BasePermission):
@@ -14,10 +15,7 @@ class IsAuthorProject(BasePermission):
         if request.method in ["PUT", "PATCH", "DELETE"]:
             project_id = view.kwargs["pk"]
             user_id = request.user.id
-            author = Contributor.objects.filter(
-                project=project_id, user=user_id, role="AUTHOR"
-            )
-            if not author.exists():
+            if not membership_cache.is_author(user_id, project_id):
                 return False
         return True
 
@@ -64,8 +62,7 @@ class IsContributor(BasePermission):
         user = request.user
         project_id = view.kwargs["project_id"]
 
-        contributor = Contributor.objects.filter(project=project_id, user=user.id)
         if request.method in ["GET", "POST"]:
-            if not contributor.exists():
+            if not membership_cache.is_contributor(user.id, project_id):
                 return False
         return True
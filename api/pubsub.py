@@ -0,0 +1,167 @@
+import asyncio
+from functools import lru_cache
+from threading import Lock
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Change
+
+# Put in place of the buffered events of an evicted subscription
+EVICTED = object()
+
+
+class Subscription:
+    """
+    Events of one channel for one connection, buffered in its event loop:
+        - deliver() can be called from any thread ;
+        - a subscriber whose buffer is full is evicted: its buffer is dropped,
+          get() returns EVICTED and the connection is expected to end.
+    """
+
+    def __init__(self, channel, buffer_size):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(buffer_size)
+        self.evicted = False
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # the loop of the connection is closed
+            pass
+
+    def _put(self, event):
+        if self.evicted:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.evict()
+
+    def evict(self):
+        self.evicted = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(EVICTED)
+
+    async def get(self, timeout):
+        """
+        return: the next event, EVICTED, or None when nothing came within timeout.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PubSubBackend:
+    """
+    Interface of the pub/sub backends (SOFTDESK_LIVE_BACKEND).
+    The events are dicts that can be serialized to JSON.
+    """
+
+    def subscribe(self, channel, buffer_size):
+        """
+        Must be called from the event loop of the connection.
+        return: a Subscription
+        """
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, channel, events):
+        """
+        Send the events to every subscription of the channel, from any thread.
+        """
+        raise NotImplementedError
+
+    def active(self):
+        """
+        return: False when publishing can be skipped, as nobody can be listening.
+        """
+        return True
+
+
+class LocalPubSub(PubSubBackend):
+    """
+    In-process backend: the writes reach the connections served by the same
+    process only, so it fits one ASGI process (and the tests).
+    """
+
+    def __init__(self):
+        self.channels = {}
+        self.lock = Lock()
+
+    def subscribe(self, channel, buffer_size):
+        subscription = Subscription(channel, buffer_size)
+        with self.lock:
+            self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.channels.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.channels.pop(subscription.channel, None)
+
+    def publish(self, channel, events):
+        with self.lock:
+            subscriptions = list(self.channels.get(channel, ()))
+        for subscription in subscriptions:
+            for event in events:
+                subscription.deliver(event)
+
+    def active(self):
+        return bool(self.channels)
+
+
+@lru_cache(maxsize=None)
+def load_backend(path):
+    return import_string(path)()
+
+
+def get_backend():
+    return load_backend(getattr(settings, "SOFTDESK_LIVE_BACKEND", "api.pubsub.LocalPubSub"))
+
+
+def project_channel(project_id):
+    return f"project:{project_id}"
+
+
+def publish_changes(entries):
+    """
+    Publish the change log entries just recorded (see changes.record_objects)
+    to the live connections of their projects, once the transaction commits.
+    """
+    backend = get_backend()
+    if entries and backend.active():
+        transaction.on_commit(lambda: publish_entries(backend, entries))
+
+
+def publish_entries(backend, entries):
+    # the project of a comment entry is read by its insert (see
+    # changes.record_comment), it is read back from the log
+    unresolved = [entry.pk for entry in entries if not isinstance(entry.project_id, int)]
+    projects = {}
+    if unresolved:
+        projects = dict(Change.objects.filter(pk__in=unresolved).values_list("pk", "project_id"))
+    events = {}
+    for entry in entries:
+        project_id = projects.get(entry.pk, entry.project_id)
+        if not isinstance(project_id, int):
+            continue
+        events.setdefault(project_id, []).append(
+            {
+                "seq": entry.pk,
+                "model": entry.model,
+                "id": entry.object_id,
+                "action": entry.action,
+            }
+        )
+    for project_id, project_events in events.items():
+        backend.publish(project_channel(project_id), project_events)
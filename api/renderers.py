@@ -0,0 +1,116 @@
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Same output as the DRF renderer: compact, UTF-8, U+2028 / U+2029 escaped
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+LINE_SEPARATORS = [("\u2028".encode(), b"\\u2028"), ("\u2029".encode(), b"\\u2029")]
+
+# The types the fast encoders do not know are encoded by the DRF encoder
+encode_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer using orjson when it is installed, with the same output as
+    the DRF renderer. Indented output and settings orjson cannot honor
+    (UNICODE_JSON / COMPACT_JSON off) fall back to the stdlib json module.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        content = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        for character, escaped in LINE_SEPARATORS:
+            if character in content:
+                content = content.replace(character, escaped)
+        return content
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSON parser using orjson for UTF-8 bodies when it is installed.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack encoding of the responses, negotiated with
+    Accept: application/msgpack (or ?format=msgpack). Needs msgpack.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    available = msgpack is not None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """
+    MessagePack request bodies, sent with Content-Type: application/msgpack.
+    """
+
+    media_type = "application/msgpack"
+    renderer_class = MessagePackRenderer
+    available = msgpack is not None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except ValueError as exc:
+            raise ParseError(f"MessagePack parse error - {exc or type(exc).__name__}")
+
+
+class SoftDeskContentNegotiation(DefaultContentNegotiation):
+    """
+    Skip the renderers and parsers whose optional dependency is not installed,
+    a client asking only for them gets 406 Not Acceptable / 415 Unsupported Media Type.
+    """
+
+    def select_parser(self, request, parsers):
+        parsers = [parser for parser in parsers if getattr(parser, "available", True)]
+        return super().select_parser(request, parsers)
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderers = [
+            renderer for renderer in renderers if getattr(renderer, "available", True)
+        ]
+        return super().select_renderer(request, renderers, format_suffix)
@@ -0,0 +1,143 @@
+import base64
+import json
+import re
+
+from django.db import connection
+from django.utils.html import escape
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_TOKENS = 12
+# put around the matches by snippet(), turned into the tags once the text is escaped
+MATCH_START = "\ue000"
+MATCH_END = "\ue001"
+
+REBUILD_SQL = [
+    "DELETE FROM api_search",
+    """
+    INSERT INTO api_search (rowid, title, body, kind, object_id, issue_id, project_id)
+    SELECT id * 2, title, description, 'issue', id, id, project_id FROM api_issue
+    """,
+    """
+    INSERT INTO api_search (rowid, title, body, kind, object_id, issue_id, project_id)
+    SELECT api_comment.id * 2 + 1, '', api_comment.description, 'comment',
+           api_comment.id, api_comment.issue_id, api_issue.project_id
+    FROM api_comment INNER JOIN api_issue ON api_issue.id = api_comment.issue_id
+    """,
+    "INSERT INTO api_search (api_search) VALUES ('optimize')",
+]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def match_expression(text):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one
+    as a prefix. Words are quoted so the FTS5 syntax cannot be injected.
+    return: the expression, or None when the text has no word.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def encode_cursor(score, rowid):
+    return base64.urlsafe_b64encode(json.dumps([score, rowid]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        score, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(rowid)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor.")
+
+
+def highlight(snippet):
+    """
+    return: the snippet as HTML, its text escaped and the matches in <mark>.
+    """
+    if snippet is None:
+        return None
+    return escape(snippet).replace(MATCH_START, SNIPPET_START).replace(MATCH_END, SNIPPET_END)
+
+
+def search(text, page_size, project_id=None, user_id=None, cursor=None):
+    """
+    Ranked (bm25) full-text search over issue titles / descriptions and comments,
+    in one project or in every project of a user.
+    return: (results, cursor of the next page or None)
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return [], None
+
+    # soft-deleted issues stay indexed until they are purged
+    filters = [
+        "api_search MATCH %s",
+        "issue_id NOT IN (SELECT id FROM api_issue WHERE deleted_time IS NOT NULL)",
+    ]
+    params = [expression]
+    if project_id is not None:
+        filters.append("project_id = %s")
+        params.append(project_id)
+    if user_id is not None:
+        filters.append(
+            "project_id IN (SELECT project_id FROM api_contributor WHERE user_id = %s)"
+        )
+        params.append(user_id)
+
+    after = ""
+    if cursor is not None:
+        after = "WHERE (score, rowid) > (%s, %s)"
+        params.extend(decode_cursor(cursor))
+
+    sql = f"""
+        SELECT rowid, kind, object_id, issue_id, project_id, title, snippet, score
+        FROM (
+            SELECT rowid, kind, object_id, issue_id, project_id, title,
+                   snippet(api_search, -1, %s, %s, '…', %s) AS snippet,
+                   rank AS score
+            FROM api_search
+            WHERE {" AND ".join(filters)}
+        )
+        {after}
+        ORDER BY score, rowid
+        LIMIT %s
+    """
+    params = [MATCH_START, MATCH_END, SNIPPET_TOKENS] + params + [page_size + 1]
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+
+    results = [
+        {
+            "type": kind,
+            "id": object_id,
+            "issue": issue_id,
+            "project": project,
+            "title": title or None,
+            "snippet": highlight(snippet),
+            "score": score,
+        }
+        for _, kind, object_id, issue_id, project, title, snippet, score in rows[:page_size]
+    ]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = rows[page_size - 1]
+        next_cursor = encode_cursor(last[7], last[0])
+    return results, next_cursor
+
+
+def rebuild():
+    """
+    Rebuild the full-text index from the issue and comment tables.
+    """
+    with connection.cursor() as db_cursor:
+        for statement in REBUILD_SQL:
+            db_cursor.execute(statement)
@@ -1,20 +1,89 @@
+from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
-from .models import Project, Issue, Comment, Contributor
+from rest_framework.validators import UniqueTogetherValidator
+from .models import AssigneeStats, Project, ProjectStats, Issue, Comment, Contributor
 
+FIELDS_QUERY_PARAM = "fields"
 
-class ContributorSerializer(ModelSerializer):
+
+def sparse_fields(request, available):
+    """
+    return: the fields asked with ?fields=id,title among the available ones,
+            in the serializer's order, or None when the parameter is absent.
+    Only read requests are restricted, writes keep validating every field.
+    """
+    if request is None or request.method != "GET":
+        return None
+    value = request.query_params.get(FIELDS_QUERY_PARAM)
+    if value is None:
+        return None
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = names - set(available)
+    if not names or unknown:
+        raise serializers.ValidationError(
+            {FIELDS_QUERY_PARAM: [f"Expected some of {', '.join(available)}."]}
+        )
+    return [name for name in available if name in names]
+
+
+class SparseFieldsMixin:
+    """
+    Drop the fields not asked with ?fields= from the representation.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = sparse_fields(self.context.get("request"), self.Meta.fields)
+        if names is not None:
+            for name in set(self.fields) - set(names):
+                self.fields.pop(name)
+
+
+class ContributorSerializer(SparseFieldsMixin, ModelSerializer):
     class Meta:
         model = Contributor
         fields = ["id", "role", "project", "user"]
+        validators = [
+            UniqueTogetherValidator(
+                queryset=Contributor.objects.all(),
+                fields=["project", "user"],
+                message="This user is already a contributor of the project.",
+            )
+        ]
+
+
+class ContributorBulkSerializer(serializers.Serializer):
+    """
+    Users to add to or remove from a project, by email and / or id.
+    """
 
+    emails = serializers.ListField(child=serializers.EmailField(), required=False)
+    user_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    role = serializers.ChoiceField(
+        choices=[Contributor.CONTRIBUTOR], default=Contributor.CONTRIBUTOR
+    )
 
-class ProjectListSerializer(ModelSerializer):
+    def validate(self, attrs):
+        if not attrs.get("emails") and not attrs.get("user_ids"):
+            raise serializers.ValidationError("Send a list of emails or user_ids.")
+        return attrs
+
+
+class ProjectListSerializer(SparseFieldsMixin, ModelSerializer):
     class Meta:
         model = Project
-        fields = ["id", "title", "description", "type", "contributor"]
+        fields = [
+            "id",
+            "title",
+            "description",
+            "type",
+            "contributor",
+            "issue_count",
+            "open_issue_count",
+        ]
 
 
-class ProjectDetailSerializer(ModelSerializer):
+class ProjectDetailSerializer(SparseFieldsMixin, ModelSerializer):
     contributor_project = ContributorSerializer(many=True)
 
     class Meta:
@@ -22,13 +91,22 @@ class ProjectDetailSerializer(ModelSerializer):
         fields = ["id", "title", "description", "type", "contributor_project"]
 
 
-class IssueListSerializer(ModelSerializer):
+class IssueListSerializer(SparseFieldsMixin, ModelSerializer):
     class Meta:
         model = Issue
-        fields = ["id", "title", "priority", "tag", "status", "created_time"]
+        fields = [
+            "id",
+            "title",
+            "priority",
+            "tag",
+            "status",
+            "created_time",
+            "comment_count",
+            "last_comment_time",
+        ]
 
 
-class IssueDetailSerializer(ModelSerializer):
+class IssueDetailSerializer(SparseFieldsMixin, ModelSerializer):
     class Meta:
         model = Issue
         fields = [
@@ -45,7 +123,45 @@ class IssueDetailSerializer(ModelSerializer):
         ]
 
 
-class CommentSerializer(ModelSerializer):
+class IssueBulkItemSerializer(IssueDetailSerializer):
+    """
+    Validate one item of a bulk issue creation.
+    The related users and the project are resolved once for the whole batch.
+    """
+
+    class Meta(IssueDetailSerializer.Meta):
+        read_only_fields = ["author_user", "assignee", "project"]
+
+
+class CommentSerializer(SparseFieldsMixin, ModelSerializer):
     class Meta:
         model = Comment
         fields = ["id", "description", "author_user", "issue", "created_time"]
+
+    def get_extra_kwargs(self):
+        extra_kwargs = super().get_extra_kwargs()
+        if self.instance is not None:
+            # a comment stays on its issue: the counters of the issues and of
+            # their projects are only updated on create and delete
+            extra_kwargs["issue"] = {**extra_kwargs.get("issue", {}), "read_only": True}
+        return extra_kwargs
+
+
+class AssigneeStatsSerializer(ModelSerializer):
+    class Meta:
+        model = AssigneeStats
+        fields = ["assignee", "to_do", "in_progress", "done"]
+
+
+class ProjectStatsSerializer(ModelSerializer):
+    assignees = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProjectStats
+        fields = ["project", "to_do", "in_progress", "done", "comment_count", "assignees"]
+
+    def get_assignees(self, stats):
+        assignees = AssigneeStats.objects.filter(project_id=stats.project_id).exclude(
+            to_do=0, in_progress=0, done=0
+        )
+        return AssigneeStatsSerializer(assignees.order_by("assignee_id"), many=True).data
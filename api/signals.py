@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import changes, stats
+from .db import apply_sqlite_profile
+from .cache import membership_cache
+from .models import Change, Comment, Contributor, Issue, Project, ProjectStats
+
+
+def invalidate_memberships(project_id, user_ids):
+    """
+    Drop the cached memberships now and once more after commit, so a
+    concurrent request cannot re-cache a membership that is being changed.
+    """
+    user_ids = list(user_ids)
+    membership_cache.invalidate(project_id, user_ids)
+    transaction.on_commit(lambda: membership_cache.invalidate(project_id, user_ids))
+
+
+@receiver(pre_save, sender=Contributor)
+def remember_previous_membership(sender, instance, **kwargs):
+    """
+    Keep the membership an updated contributor had before the save.
+    """
+    instance._previous_membership = None
+    if instance.pk:
+        instance._previous_membership = (
+            Contributor.objects.filter(pk=instance.pk)
+            .values_list("project_id", "user_id")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Contributor)
+@receiver(post_delete, sender=Contributor)
+def invalidate_contributor_membership(sender, instance, **kwargs):
+    invalidate_memberships(instance.project_id, [instance.user_id])
+    previous = getattr(instance, "_previous_membership", None)
+    if previous and previous != (instance.project_id, instance.user_id):
+        invalidate_memberships(previous[0], [previous[1]])
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_memberships(sender, instance, **kwargs):
+    # On delete the contributors are already gone (and invalidated by their own
+    # post_delete through the cascade), so this only matters for saves.
+    user_ids = Contributor.objects.filter(project=instance.pk).values_list(
+        "user_id", flat=True
+    )
+    invalidate_memberships(instance.pk, user_ids)
+
+
+@receiver(post_save, sender=Project)
+def bump_project_version(sender, instance, created, **kwargs):
+    if not created:
+        Project.bump_version(pk=instance.pk)
+
+
+# the issues bump their project with its counters (see stats.issue_saved)
+@receiver(post_save, sender=Contributor)
+@receiver(post_delete, sender=Contributor)
+def bump_project_version_of_child(sender, instance, **kwargs):
+    Project.bump_version(pk=instance.project_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_project_version_of_comment(sender, instance, **kwargs):
+    Project.bump_version(issue=instance.issue_id)
+
+
+@receiver(post_save, sender=Project)
+def create_project_stats(sender, instance, created, **kwargs):
+    if created:
+        ProjectStats.objects.create(project=instance)
+
+
+@receiver(pre_save, sender=Issue)
+def load_issue_state(sender, instance, **kwargs):
+    stats.load_issue_state(instance)
+
+
+@receiver(post_save, sender=Issue)
+def count_saved_issue(sender, instance, created, **kwargs):
+    stats.issue_saved(instance, created)
+
+
+@receiver(post_delete, sender=Issue)
+def count_deleted_issue(sender, instance, **kwargs):
+    stats.issue_deleted(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        stats.comments_changed(instance.issue_id, 1)
+        stats.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    stats.comments_changed(instance.issue_id, -1)
+    stats.comment_removed(instance)
+
+
+@receiver(post_save, sender=Issue)
+@receiver(post_save, sender=Contributor)
+def record_saved_change(sender, instance, created, **kwargs):
+    model = Change.ISSUE if sender is Issue else Change.CONTRIBUTOR
+    action = Change.CREATE if created else Change.UPDATE
+    changes.record(instance.project_id, model, [instance.pk], action)
+
+
+@receiver(post_delete, sender=Issue)
+@receiver(post_delete, sender=Contributor)
+def record_deleted_change(sender, instance, **kwargs):
+    model = Change.ISSUE if sender is Issue else Change.CONTRIBUTOR
+    changes.record(instance.project_id, model, [instance.pk], Change.DELETE)
+
+
+@receiver(post_save, sender=Comment)
+def record_saved_comment(sender, instance, created, **kwargs):
+    changes.record_comment(instance, Change.CREATE if created else Change.UPDATE)
+
+
+@receiver(post_delete, sender=Comment)
+def record_deleted_comment(sender, instance, **kwargs):
+    changes.record_comment(instance, Change.DELETE)
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    apply_sqlite_profile(connection)
@@ -0,0 +1,374 @@
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    ArchivedComment,
+    ArchivedIssue,
+    AssigneeStats,
+    Comment,
+    CommentRecord,
+    Issue,
+    IssueRecord,
+    Project,
+    ProjectStats,
+)
+
+STATUS_FIELDS = {
+    Issue.TO_DO: "to_do",
+    Issue.IN_PROGRESS: "in_progress",
+    Issue.DONE: "done",
+}
+ISSUE_STATE = ("project_id", "assignee_id", "status")
+COUNTERS_BATCH_SIZE = 1000
+
+
+def increment(model, lookup, deltas):
+    """
+    Add the deltas to the counters of the row matching the lookup with one
+    F() update. The row is only created for positive changes, so a cascade
+    delete never recreates the stats of a project being deleted.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    created = {field: delta for field, delta in deltas.items() if delta > 0}
+    if not created:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **created)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**updates)
+
+
+def apply_issue_counts(counts, bumped=()):
+    """
+    counts: {(project_id, assignee_id, status): delta}
+    bumped: ids of the projects whose version is bumped (see Project.bump_version)
+            by the update of their counters.
+    One update per stats row and per project.
+    """
+    assignee_deltas = defaultdict(Counter)
+    project_deltas = defaultdict(Counter)
+    for (project_id, assignee_id, status), delta in counts.items():
+        field = STATUS_FIELDS.get(status)
+        if field is None or not delta:
+            continue
+        assignee_deltas[project_id, assignee_id][field] += delta
+        project_deltas[project_id][field] += delta
+    for (project_id, assignee_id), deltas in assignee_deltas.items():
+        increment(
+            AssigneeStats, {"project_id": project_id, "assignee_id": assignee_id}, deltas
+        )
+    for project_id in bumped:
+        project_deltas.setdefault(project_id, Counter())
+    for project_id, deltas in project_deltas.items():
+        increment(ProjectStats, {"project_id": project_id}, deltas)
+        issue_delta = sum(deltas.values())
+        open_delta = issue_delta - deltas["done"]
+        updates = {}
+        if issue_delta:
+            updates["issue_count"] = F("issue_count") + issue_delta
+        if open_delta:
+            updates["open_issue_count"] = F("open_issue_count") + open_delta
+        if project_id in bumped:
+            updates.update(version=F("version") + 1, modified_time=timezone.now())
+        if updates:
+            Project.all_objects.filter(pk=project_id).update(**updates)
+
+
+def issue_state(values):
+    return tuple(values.get(name) for name in ISSUE_STATE)
+
+
+def issue_saved(issue, created):
+    """
+    Count a new issue, or move an updated one between status / assignee / project,
+    and bump the version of its project(s).
+    The previous values are kept by Issue.from_db (or the pre_save signal).
+    """
+    loaded = getattr(issue, "_loaded_values", {})
+    # deferred fields were not saved, they keep their previous value
+    new = issue_state({**loaded, **vars(issue)})
+    old = None if created else issue_state(loaded)
+    issue._loaded_values = {**loaded, **dict(zip(ISSUE_STATE, new))}
+    counts = Counter()
+    if old != new:
+        counts[new] += 1
+        if old is not None:
+            counts[old] -= 1
+    bumped = {state[0] for state in (old, new) if state is not None}
+    apply_issue_counts(counts, bumped)
+
+
+def load_issue_state(issue):
+    """
+    Read the stored status / assignee / project of an issue about to be
+    updated, when they were not loaded with the instance.
+    """
+    loaded = getattr(issue, "_loaded_values", {})
+    if issue._state.adding or all(name in loaded for name in ISSUE_STATE):
+        return
+    values = Issue.objects.filter(pk=issue.pk).values_list(*ISSUE_STATE).first()
+    if values is not None:
+        issue._loaded_values = {**loaded, **dict(zip(ISSUE_STATE, values))}
+
+
+def issue_deleted(issue):
+    apply_issue_counts({issue_state(vars(issue)): -1}, [issue.project_id])
+
+
+def issues_created(issues):
+    """
+    Count issues inserted with bulk_create, which sends no signal, and bump
+    the version of their projects.
+    """
+    apply_issue_counts(
+        Counter(issue_state(vars(issue)) for issue in issues),
+        {issue.project_id for issue in issues},
+    )
+
+
+def comments_changed(issue_id, delta):
+    """
+    Add delta to the comment count of the issue's project.
+    """
+    updated = ProjectStats.objects.filter(project__issue=issue_id).update(
+        comment_count=F("comment_count") + delta
+    )
+    if updated or delta < 0:
+        return
+    project_id = (
+        Issue.objects.filter(pk=issue_id).values_list("project_id", flat=True).first()
+    )
+    if project_id is not None:
+        increment(ProjectStats, {"project_id": project_id}, {"comment_count": delta})
+
+
+def comment_added(comment):
+    """
+    Count a new comment on its issue, which was commented last.
+    """
+    Issue.all_objects.filter(pk=comment.issue_id).update(
+        comment_count=F("comment_count") + 1, last_comment_time=comment.created_time
+    )
+
+
+def comment_removed(comment):
+    """
+    Uncount a deleted comment, the last comment time is read again from the
+    comments left in the same update.
+    """
+    Issue.all_objects.filter(pk=comment.issue_id).update(
+        comment_count=F("comment_count") - 1,
+        last_comment_time=Subquery(last_comment_times(Comment.all_objects)),
+    )
+
+
+def last_comment_times(comments):
+    return (
+        comments.filter(issue_id=OuterRef("pk"))
+        .order_by()
+        .values("issue_id")
+        .annotate(last=Max("created_time"))
+        .values("last")
+    )
+
+
+def counted(rows, group):
+    """
+    return: subquery counting the rows (filtered on an OuterRef) of one project
+            or issue, the group field.
+    """
+    return Coalesce(
+        Subquery(rows.order_by().values(group).annotate(count=Count("id")).values("count")),
+        Value(0),
+    )
+
+
+def repair_rows(queryset, expected, project_field, batch_size, fixed_projects):
+    """
+    Compare the counters of the rows with their expected value (expressions
+    annotated on the queryset), and write the wrong ones with one bulk update
+    per batch of rows, each batch in its own transaction.
+    fixed_projects: set completed with the projects (project_field) of the fixed rows.
+    return: number of rows fixed
+    """
+    model = queryset.model
+    fields = list(expected)
+    annotations = {f"expected_{name}": value for name, value in expected.items()}
+    fixed = 0
+    last_pk = None
+    while True:
+        with transaction.atomic():
+            batch = queryset.order_by("pk")
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            rows = list(
+                batch.annotate(**annotations).values_list(
+                    "pk", project_field, *fields, *annotations
+                )[:batch_size]
+            )
+            if not rows:
+                return fixed
+            last_pk = rows[-1][0]
+            wrong = []
+            for pk, project_id, *values in rows:
+                stored, computed = values[: len(fields)], values[len(fields) :]
+                if stored != computed:
+                    wrong.append(model(pk=pk, **dict(zip(fields, computed))))
+                    fixed_projects.add(project_id)
+            model._base_manager.bulk_update(wrong, fields)
+            fixed += len(wrong)
+
+
+def repair_counters(project_ids=None, batch_size=COUNTERS_BATCH_SIZE):
+    """
+    Recompute the issue counters of the projects and the comment counters of
+    the issues (archived ones included) from the rows, and fix the wrong ones.
+    return: {"projects": fixed, "issues": fixed, "archived issues": fixed}
+    """
+    projects = Project.objects.all()
+    issues = Issue.all_objects.all()
+    archived_issues = ArchivedIssue.objects.all()
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+        issues = issues.filter(project_id__in=project_ids)
+        archived_issues = archived_issues.filter(project_id__in=project_ids)
+
+    project_issues = IssueRecord.objects.filter(project_id=OuterRef("pk"))
+    fixed_projects = set()
+    fixed = {
+        "projects": repair_rows(
+            projects,
+            {
+                "issue_count": counted(project_issues, "project_id"),
+                "open_issue_count": counted(
+                    project_issues.exclude(status=Issue.DONE), "project_id"
+                ),
+            },
+            "id",
+            batch_size,
+            fixed_projects,
+        )
+    }
+    for label, rows, comments in (
+        ("issues", issues, Comment.all_objects),
+        ("archived issues", archived_issues, ArchivedComment.objects),
+    ):
+        fixed[label] = repair_rows(
+            rows,
+            {
+                "comment_count": counted(comments.filter(issue_id=OuterRef("pk")), "issue_id"),
+                "last_comment_time": Subquery(last_comment_times(comments)),
+            },
+            "project_id",
+            batch_size,
+            fixed_projects,
+        )
+    # the cached responses of the fixed projects are stale
+    if fixed_projects:
+        Project.bump_version(pk__in=fixed_projects)
+    return fixed
+
+
+def compute(project_ids=None):
+    """
+    Compute the statistics from scratch with grouped queries, the archived
+    issues and comments included.
+    return: ({project_id: {field: count}}, {(project_id, assignee_id): {field: count}})
+    """
+    issues = IssueRecord.objects.all()
+    comments = CommentRecord.objects.all()
+    if project_ids is not None:
+        issues = issues.filter(project_id__in=project_ids)
+        comments = comments.filter(issue__project_id__in=project_ids)
+
+    project_fields = [*STATUS_FIELDS.values(), "comment_count"]
+    projects = defaultdict(lambda: dict.fromkeys(project_fields, 0))
+    assignees = defaultdict(lambda: dict.fromkeys(STATUS_FIELDS.values(), 0))
+    groups = issues.order_by().values_list(*ISSUE_STATE).annotate(count=Count("id"))
+    for project_id, assignee_id, status, count in groups:
+        field = STATUS_FIELDS.get(status)
+        if field is None:
+            continue
+        projects[project_id][field] += count
+        assignees[(project_id, assignee_id)][field] += count
+    groups = (
+        comments.order_by().values_list("issue__project_id").annotate(count=Count("id"))
+    )
+    for project_id, count in groups:
+        projects[project_id]["comment_count"] += count
+    return dict(projects), dict(assignees)
+
+
+def stored(project_ids=None):
+    """
+    return: the stored statistics, in the same shape as compute().
+    """
+    project_stats = ProjectStats.objects.all()
+    assignee_stats = AssigneeStats.objects.all()
+    if project_ids is not None:
+        project_stats = project_stats.filter(project_id__in=project_ids)
+        assignee_stats = assignee_stats.filter(project_id__in=project_ids)
+
+    fields = [*STATUS_FIELDS.values(), "comment_count"]
+    projects = {
+        row[0]: dict(zip(fields, row[1:]))
+        for row in project_stats.values_list("project_id", *fields)
+    }
+    fields = list(STATUS_FIELDS.values())
+    assignees = {
+        (row[0], row[1]): dict(zip(fields, row[2:]))
+        for row in assignee_stats.values_list("project_id", "assignee_id", *fields)
+    }
+    return projects, assignees
+
+
+def drift(project_ids=None):
+    """
+    return: [(key, stored counters, computed counters), ...] where they differ,
+            empty counters are equivalent to a missing row.
+    """
+    differences = []
+    for computed_stats, stored_stats in zip(compute(project_ids), stored(project_ids)):
+        for key in set(computed_stats) | set(stored_stats):
+            computed_value = computed_stats.get(key)
+            stored_value = stored_stats.get(key)
+            if computed_value is None:
+                computed_value = dict.fromkeys(stored_value, 0)
+            if stored_value is None:
+                stored_value = dict.fromkeys(computed_value, 0)
+            if computed_value != stored_value:
+                differences.append((key, stored_value, computed_value))
+    return differences
+
+
+def rebuild(project_ids=None):
+    """
+    Replace the stored statistics by freshly computed ones.
+    """
+    with transaction.atomic():
+        projects, assignees = compute(project_ids)
+        project_stats = ProjectStats.objects.all()
+        assignee_stats = AssigneeStats.objects.all()
+        if project_ids is not None:
+            project_stats = project_stats.filter(project_id__in=project_ids)
+            assignee_stats = assignee_stats.filter(project_id__in=project_ids)
+        project_stats.delete()
+        assignee_stats.delete()
+        ProjectStats.objects.bulk_create(
+            ProjectStats(project_id=project_id, **counts)
+            for project_id, counts in projects.items()
+        )
+        AssigneeStats.objects.bulk_create(
+            AssigneeStats(project_id=project_id, assignee_id=assignee_id, **counts)
+            for (project_id, assignee_id), counts in assignees.items()
+        )
@@ -0,0 +1,113 @@
+from collections import defaultdict
+
+from django.core.mail import EmailMessage, get_connection
+
+from . import jobs
+from .models import Contributor, Issue
+
+NOTIFY_ASSIGNEE = "notify_assignee"
+FAN_OUT_ACTIVITY = "fan_out_activity"
+
+CREATED = "created"
+REASSIGNED = "reassigned"
+
+
+def issues_changed(issues, actor_id, event):
+    """
+    Queue the notification of the assignees and the activity fan-out of
+    created or reassigned issues, run by the workers after the commit.
+    """
+    queued = []
+    for issue in issues:
+        payload = {
+            "issue_id": issue.pk,
+            "assignee_id": issue.assignee_id,
+            "actor_id": actor_id,
+            "event": event,
+        }
+        if issue.assignee_id is not None and issue.assignee_id != actor_id:
+            queued.append((NOTIFY_ASSIGNEE, payload))
+        queued.append((FAN_OUT_ACTIVITY, payload))
+    jobs.enqueue(queued)
+
+
+def send_each(messages):
+    """
+    Send {index of a payload: (subject, body, recipients)} over one connection,
+    each message on its own so a failure does not resend the others on retry.
+    return: {index: exception} of the messages that were not sent
+    """
+    errors = {}
+    if not messages:
+        return errors
+    with get_connection() as connection:
+        for index, (subject, body, recipients) in messages.items():
+            try:
+                EmailMessage(subject, body, None, recipients, connection=connection).send()
+            except Exception as error:
+                errors[index] = error
+    return errors
+
+
+def load_issues(payloads):
+    """
+    return: {issue id: values}, the deleted or archived issues are missing.
+    """
+    ids = {payload["issue_id"] for payload in payloads}
+    issues = Issue.objects.filter(pk__in=ids).values(
+        "id", "title", "status", "project_id", "project__title", "assignee_id", "assignee__email"
+    )
+    return {issue["id"]: issue for issue in issues}
+
+
+@jobs.handler(NOTIFY_ASSIGNEE, batch=True)
+def notify_assignees(payloads):
+    """
+    Email the assignees of new or reassigned issues, over one connection.
+    """
+    issues = load_issues(payloads)
+    messages = {}
+    for index, payload in enumerate(payloads):
+        issue = issues.get(payload["issue_id"])
+        # skipped when reassigned again since, the next job notifies the new assignee
+        if issue is None or issue["assignee_id"] != payload["assignee_id"]:
+            continue
+        messages[index] = (
+            f"[SoftDesk] {issue['project__title']}: issue #{issue['id']} assigned to you",
+            f"{issue['title']}\nStatus: {issue['status']}\n",
+            [issue["assignee__email"]],
+        )
+    return send_each(messages)
+
+
+@jobs.handler(FAN_OUT_ACTIVITY, batch=True)
+def fan_out_activity(payloads):
+    """
+    Email the other contributors of the projects about new or reassigned
+    issues, the members of every project are read with one query.
+    """
+    issues = load_issues(payloads)
+    members = defaultdict(list)
+    contributors = Contributor.objects.filter(
+        project_id__in={issue["project_id"] for issue in issues.values()}
+    ).values_list("project_id", "user_id", "user__email")
+    for project_id, user_id, email in contributors:
+        members[project_id].append((user_id, email))
+
+    messages = {}
+    for index, payload in enumerate(payloads):
+        issue = issues.get(payload["issue_id"])
+        if issue is None:
+            continue
+        # the actor made the change, the assignee got its own notification
+        skipped = {payload["actor_id"], payload["assignee_id"]}
+        recipients = [
+            email for user_id, email in members[issue["project_id"]] if user_id not in skipped
+        ]
+        if recipients:
+            messages[index] = (
+                f"[SoftDesk] {issue['project__title']}: issue #{issue['id']} {payload['event']}",
+                f"{issue['title']}\nStatus: {issue['status']}\n",
+                recipients,
+            )
+    return send_each(messages)
@@ -0,0 +1,526 @@
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from authentication.models import User
+from authentication.serializers import LoginSerializer
+
+from . import deletion, jobs, stats
+from .db import ReplicaRouter
+from .models import Change, Comment, Contributor, Issue, Job, Project, ProjectStats
+from .views import BatchView
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.author = User.objects.create_user("author", "author@softdesk.local", "password")
+        self.member = User.objects.create_user("member", "member@softdesk.local", "password")
+        self.project = Project.objects.create(title="project", description="d", type=Project.IOS)
+        Contributor.objects.create(user=self.author, project=self.project, role=Contributor.AUTHOR)
+        self.membership = Contributor.objects.create(
+            user=self.member, project=self.project, role=Contributor.CONTRIBUTOR
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        token = LoginSerializer.get_token(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client
+
+    def create_issue(self, **fields):
+        values = {
+            "title": "issue",
+            "description": "d",
+            "priority": Issue.LOW,
+            "tag": Issue.BUG,
+            "status": Issue.TO_DO,
+            "author_user": self.author,
+            "project": self.project,
+        }
+        values.update(fields)
+        return Issue.objects.create(**values)
+
+
+class ProjectQueryCountTests(ApiTestCase):
+    """
+    The project reads run a fixed number of queries, whatever the page size
+    and the number of contributors.
+    """
+
+    def add_projects(self, count):
+        for index in range(count):
+            project = Project.objects.create(
+                title=f"project {index}", description="d", type=Project.IOS
+            )
+            Contributor.objects.create(
+                user=self.member, project=project, role=Contributor.AUTHOR
+            )
+
+    def add_contributors(self, count):
+        start = User.objects.count()
+        for index in range(start, start + count):
+            user = User.objects.create_user(f"user{index}", f"user{index}@softdesk.local", "p")
+            Contributor.objects.create(
+                user=user, project=self.project, role=Contributor.CONTRIBUTOR
+            )
+
+    def test_list(self):
+        self.add_projects(30)
+        client = self.client_for(self.member)
+        client.get("/projects/")
+        for page_size in (2, 20):
+            with self.assertNumQueries(3):
+                response = client.get(f"/projects/?limit={page_size}")
+            self.assertEqual(len(response.data["results"]), page_size)
+
+    def test_retrieve(self):
+        client = self.client_for(self.member)
+        url = f"/projects/{self.project.pk}/"
+        client.get(url)
+        for contributors in (2, 20):
+            self.add_contributors(contributors - self.project.contributor_project.count())
+            with self.assertNumQueries(3):
+                response = client.get(url)
+            self.assertEqual(len(response.data["contributor_project"]), contributors)
+
+
+class IssueFilterTests(ApiTestCase):
+    def test_created_dates_are_whole_days(self):
+        late = self.create_issue(title="late")
+        early = self.create_issue(title="early")
+        Issue.objects.filter(pk=late.pk).update(
+            created_time=timezone.make_aware(datetime(2022, 3, 1, 23, 59, 59, 500000))
+        )
+        Issue.objects.filter(pk=early.pk).update(
+            created_time=timezone.make_aware(datetime(2022, 3, 2))
+        )
+        client = self.client_for(self.member)
+        url = f"/projects/{self.project.pk}/issues/"
+        for query, titles in (
+            ("created_before=2022-03-01", ["late"]),
+            ("created_after=2022-03-02", ["early"]),
+            ("created_after=2022-03-01&created_before=2022-03-02", ["early", "late"]),
+        ):
+            response = client.get(f"{url}?{query}&ordering=title")
+            self.assertEqual([issue["title"] for issue in response.data["results"]], titles)
+
+
+class SearchTests(ApiTestCase):
+    def test_snippet_is_escaped(self):
+        self.create_issue(description='<img src=x onerror="alert(1)"> crash <b>now</b>')
+        response = self.client_for(self.member).get(
+            f"/projects/{self.project.pk}/search/?q=crash"
+        )
+        self.assertEqual(
+            response.data["results"][0]["snippet"],
+            "&lt;img src=x onerror=&quot;alert(1)&quot;&gt; <mark>crash</mark> "
+            "&lt;b&gt;now&lt;/b&gt;",
+        )
+
+
+@override_settings(SOFTDESK_QUERY_BUDGET_STRICT=True)
+class WriteBudgetTests(ApiTestCase):
+    """
+    The writes stay within their query budget on their slowest path: cold
+    caches and a new statistics row for the assignee.
+    """
+
+    def request(self, method, url, data):
+        for cache in caches.all():
+            cache.clear()
+        return getattr(self.client_for(self.author), method)(url, data, format="json")
+
+    def test_issue_and_comment_writes(self):
+        issues = f"/projects/{self.project.pk}/issues/"
+        response = self.request(
+            "post",
+            issues,
+            {
+                "title": "t",
+                "description": "d",
+                "priority": Issue.LOW,
+                "tag": Issue.BUG,
+                "status": Issue.TO_DO,
+                "assignee": "member@softdesk.local",
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        issue_url = f"{issues}{response.data['id']}/"
+        response = self.request(
+            "patch", issue_url, {"status": Issue.DONE, "assignee": "author@softdesk.local"}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.request(
+            "post",
+            f"{issue_url}comments/",
+            {"description": "c", "author_user": self.author.pk, "issue": response.data["id"]},
+        )
+        self.assertEqual(response.status_code, 201)
+        response = self.request(
+            "patch", f"{issue_url}comments/{response.data['id']}/", {"description": "edited"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class ContributorBulkTests(ApiTestCase):
+    def test_removed_members_are_refused(self):
+        member = self.client_for(self.member)
+        url = f"/projects/{self.project.pk}/issues/"
+        self.assertEqual(member.get(url).status_code, 200)
+        response = self.client_for(self.author).delete(
+            f"/projects/{self.project.pk}/users/bulk/",
+            {"user_ids": [self.member.pk]},
+            format="json",
+        )
+        self.assertEqual(response.data["removed"], [self.member.pk])
+        self.assertFalse(Contributor.objects.filter(pk=self.membership.pk).exists())
+        self.assertEqual(member.get(url).status_code, 403)
+
+    def test_purge_forgets_memberships(self):
+        member = self.client_for(self.member)
+        url = f"/projects/{self.project.pk}/issues/"
+        self.assertEqual(member.get(url).status_code, 200)
+        Project.objects.filter(pk=self.project.pk).update(deleted_time=timezone.now())
+        deletion.purge()
+        self.assertFalse(Contributor.objects.exists())
+        self.assertEqual(member.get(url).status_code, 403)
+
+
+class CommentCounterTests(ApiTestCase):
+    def test_comment_stays_on_its_issue(self):
+        issue = self.create_issue()
+        other_project = Project.objects.create(title="other", description="d", type=Project.IOS)
+        Contributor.objects.create(
+            user=self.author, project=other_project, role=Contributor.AUTHOR
+        )
+        other = self.create_issue(project=other_project)
+        comment = Comment.objects.create(description="c", author_user=self.author, issue=issue)
+
+        response = self.client_for(self.author).patch(
+            f"/projects/{self.project.pk}/issues/{issue.pk}/comments/{comment.pk}/",
+            {"description": "edited", "issue": other.pk},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["issue"], issue.pk)
+        comment.refresh_from_db()
+        self.assertEqual((comment.issue_id, comment.description), (issue.pk, "edited"))
+        issue.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((issue.comment_count, other.comment_count), (1, 0))
+        self.assertEqual(other.last_comment_time, None)
+        self.assertEqual(ProjectStats.objects.get(project=self.project).comment_count, 1)
+        self.assertEqual(ProjectStats.objects.get(project=other_project).comment_count, 0)
+
+
+class SeedTests(TestCase):
+    def test_seeded_counters_are_right(self):
+        call_command(
+            "seed_softdesk",
+            users=5,
+            projects=3,
+            contributors=8,
+            issues=20,
+            comments=40,
+            seed=1,
+            stdout=StringIO(),
+        )
+        self.assertEqual(
+            stats.repair_counters(), {"projects": 0, "issues": 0, "archived issues": 0}
+        )
+
+
+class SoftDeleteTests(ApiTestCase):
+    def test_stale_issue_stays_deleted(self):
+        issue = self.create_issue()
+        stale = Issue.objects.get(pk=issue.pk)
+        deletion.soft_delete_issue(issue)
+
+        stale.title = "edited"
+        stale.save()
+        self.assertFalse(Issue.objects.filter(pk=issue.pk).exists())
+        issue = Issue.all_objects.get(pk=issue.pk)
+        self.assertEqual(issue.title, "edited")
+        self.assertIsNotNone(issue.deleted_time)
+
+
+class ValuesFastPathTests(ApiTestCase):
+    def get(self, path):
+        for cache in caches.all():
+            cache.clear()
+        response = self.client_for(self.author).get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_same_body_as_the_serializer(self):
+        issue = self.create_issue(assignee=self.member)
+        self.create_issue(title="other", status=Issue.DONE)
+        Comment.objects.create(description="c", author_user=self.member, issue=issue)
+        Comment.objects.create(description="d", author_user=self.author, issue=issue)
+        issues = f"/projects/{self.project.pk}/issues/"
+        paths = [
+            "/projects/",
+            "/projects/?fields=id,title",
+            issues,
+            issues + "?fields=id,title,created_time",
+            issues + "?status=DONE&fields=id",
+            f"/projects/{self.project.pk}/users/",
+            f"/projects/{self.project.pk}/users/?fields=user,role",
+            f"{issues}{issue.pk}/comments/",
+            f"{issues}{issue.pk}/comments/?fields=id,created_time",
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                fast = self.get(path)
+                with override_settings(SOFTDESK_VALUES_FAST_PATH=False):
+                    self.assertEqual(self.get(path), fast)
+
+
+class IssueBulkTests(ApiTestCase):
+    def test_assignee_must_be_an_email(self):
+        item = {
+            "title": "t",
+            "description": "d",
+            "priority": Issue.LOW,
+            "tag": Issue.BUG,
+            "status": Issue.TO_DO,
+        }
+        response = self.client_for(self.author).post(
+            f"/projects/{self.project.pk}/issues/?mode=partial",
+            [
+                {**item, "assignee": ["member@softdesk.local"]},
+                {**item, "assignee": {"email": "member@softdesk.local"}},
+                {**item, "assignee": "member@softdesk.local"},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result["status"] for result in response.data], [400, 400, 201])
+        self.assertIn("assignee", response.data[0]["errors"])
+        self.assertEqual(response.data[2]["issue"]["assignee"], self.member.pk)
+
+
+class ConditionalGetTests(ApiTestCase):
+    def test_etag_only(self):
+        client = self.client_for(self.member)
+        url = f"/projects/{self.project.pk}/issues/"
+        response = client.get(url)
+        self.assertNotIn("Last-Modified", response)
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(
+            client.get(url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT").status_code,
+            200,
+        )
+
+    def test_missing_issue_is_not_found(self):
+        client = self.client_for(self.member)
+        other_project = Project.objects.create(title="other", description="d", type=Project.IOS)
+        other = self.create_issue(project=other_project)
+        for issue_id in (other.pk, other.pk + 1, "x"):
+            response = client.get(
+                f"/projects/{self.project.pk}/issues/{issue_id}/", HTTP_IF_NONE_MATCH="*"
+            )
+            self.assertEqual(response.status_code, 404, issue_id)
+        issue = self.create_issue()
+        response = client.get(
+            f"/projects/{self.project.pk}/issues/{issue.pk}/", HTTP_IF_NONE_MATCH="*"
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        self.handled = []
+        patcher = mock.patch.dict(jobs.HANDLERS, {"test": (self.handle, True)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Job.objects.bulk_create([Job(kind="test", payload={"n": n}) for n in range(3)])
+
+    def handle(self, payloads):
+        self.handled.extend(payload["n"] for payload in payloads)
+        return {1: ValueError("bad payload")}
+
+    def test_only_failed_items_are_retried(self):
+        self.assertEqual(jobs.run(jobs.claim("worker", 10)), 2)
+        self.assertEqual(self.handled, [0, 1, 2])
+        job = Job.objects.get()
+        self.assertEqual((job.payload, job.status), ({"n": 1}, Job.QUEUED))
+        self.assertEqual(job.last_error, "ValueError: bad payload")
+
+    def test_jobs_claimed_again_are_left_alone(self):
+        claimed = jobs.claim("worker", 10)
+        # the lease expired and another worker claimed the jobs
+        Job.objects.update(locked_by="other:token")
+        self.assertEqual(jobs.run(claimed), 2)
+        self.assertEqual(
+            list(Job.objects.values_list("status", "locked_by", "last_error")),
+            [(Job.RUNNING, "other:token", "")] * 3,
+        )
+
+
+class BatchTests(ApiTestCase):
+    """
+    Run outside of the test client, which disconnects close_old_connections:
+    the sub-requests must not send request_finished, in a transaction
+    (ATOMIC_REQUESTS) it would close the connection of the batch.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.finished = []
+        request_finished.connect(self.request_finished)
+        self.addCleanup(request_finished.disconnect, self.request_finished)
+
+    def request_finished(self, **kwargs):
+        self.finished.append(kwargs)
+
+    def run_batch(self, *paths):
+        request = APIRequestFactory().post(
+            "/batch/",
+            {
+                "requests": [
+                    {"id": f"r{index}", "method": "GET", "path": path}
+                    for index, path in enumerate(paths)
+                ]
+            },
+            format="json",
+        )
+        force_authenticate(request, user=self.member)
+        with transaction.atomic():
+            response = BatchView.as_view()(request)
+        self.assertEqual(self.finished, [])
+        return [item["status"] for item in response.data["responses"]]
+
+    def test_batch_keeps_its_connection(self):
+        issue = self.create_issue()
+        issues = f"/projects/{self.project.pk}/issues/"
+        statuses = self.run_batch(
+            issues, f"{issues}{issue.pk}/", f"{issues}{issue.pk}/comments/", issues
+        )
+        self.assertEqual(statuses, [200] * 4)
+
+    def test_streamed_response_is_refused(self):
+        statuses = self.run_batch(
+            f"/projects/{self.project.pk}/export/", f"/projects/{self.project.pk}/issues/"
+        )
+        self.assertEqual(statuses, [400, 200])
+
+
+@override_settings(SOFTDESK_DATABASE_REPLICAS=["replica"])
+class ReplicaReadTests(ApiTestCase):
+    """
+    The replica alias is served by the test database, the reads routed to it
+    are recorded: the memberships and token versions cached across requests
+    must be read from the primary.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.replica_reads = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            if alias != DEFAULT_DB_ALIAS:
+                self.replica_reads.append(model)
+            return DEFAULT_DB_ALIAS
+
+        patcher = mock.patch.object(ReplicaRouter, "db_for_read", record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assert_checks_on_primary(self):
+        self.assertTrue(self.replica_reads, "the list was not read from the replica")
+        self.assertNotIn(Contributor, self.replica_reads)
+        self.assertNotIn(User, self.replica_reads)
+
+    def test_removed_member_is_refused(self):
+        client = self.client_for(self.member)
+        url = f"/projects/{self.project.pk}/issues/"
+        self.assertEqual(client.get(url).status_code, 200)
+
+        self.membership.delete()
+        self.replica_reads.clear()
+        self.assertEqual(client.get(url).status_code, 403)
+        self.assertEqual(client.get(url).status_code, 403)
+        self.assertNotIn(Contributor, self.replica_reads)
+
+    def test_revoked_token_is_refused(self):
+        client = self.client_for(self.member)
+        url = f"/projects/{self.project.pk}/issues/"
+        self.assertEqual(client.get(url).status_code, 200)
+        self.assert_checks_on_primary()
+
+        self.member.revoke_tokens()
+        self.replica_reads.clear()
+        self.assertEqual(client.get(url).status_code, 401)
+        self.assertNotIn(User, self.replica_reads)
+        response = client.post(
+            url,
+            {
+                "title": "t",
+                "description": "d",
+                "priority": Issue.LOW,
+                "tag": Issue.BUG,
+                "status": Issue.TO_DO,
+                "assignee": "",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_batch_reads_own_writes(self):
+        client = self.client_for(self.member)
+        issues = f"/projects/{self.project.pk}/issues/"
+        response = client.post(
+            "/batch/",
+            {
+                "requests": [
+                    {"id": "list", "method": "GET", "path": issues},
+                    {"id": "changes", "method": "GET", "path": f"/projects/{self.project.pk}/changes/"},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual([item["status"] for item in response.data["responses"]], [200, 200])
+        self.assertIn(Issue, self.replica_reads)
+        self.assertNotIn(Change, self.replica_reads)
+        self.assertNotIn(Contributor, self.replica_reads)
+
+        for cache in caches.all():
+            cache.clear()
+        self.replica_reads.clear()
+        body = {
+            "title": "t",
+            "description": "d",
+            "priority": Issue.LOW,
+            "tag": Issue.BUG,
+            "status": Issue.TO_DO,
+            "assignee": "",
+        }
+        response = client.post(
+            "/batch/",
+            {
+                "requests": [
+                    {"id": "list", "method": "GET", "path": issues},
+                    {"id": "new", "method": "POST", "path": issues, "body": body},
+                    {"id": "again", "method": "GET", "path": issues},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(
+            [item["status"] for item in response.data["responses"]], [200, 201, 200]
+        )
+        self.assertEqual(self.replica_reads.count(Issue), 1)
@@ -4,8 +4,12 @@ from rest_framework import routers
 
 
 from api.views import (
+    BatchView,
+    ChangesView,
     CommentView,
     ContributorView,
+    ExportView,
+    SearchView,
     ProjectView,
     IssueView,
 )
@@ -24,5 +28,22 @@ urlpatterns = [
     path("api-auth/", include("rest_framework.urls")),
     path("", include(router.urls)),
     path("projects/<int:project_id>/", include(router_2.urls)),
+    path(
+        "projects/<int:project_id>/export/",
+        ExportView.as_view(),
+        name="projects-export",
+    ),
+    path(
+        "projects/<int:project_id>/changes/",
+        ChangesView.as_view(),
+        name="projects-changes",
+    ),
+    path(
+        "projects/<int:project_id>/search/",
+        SearchView.as_view(),
+        name="projects-search",
+    ),
+    path("search/", SearchView.as_view(), name="search"),
+    path("batch/", BatchView.as_view(), name="batch"),
     path("projects/<int:project_id>/issues/<issue_id>/", include(router_3.urls)),
 ]
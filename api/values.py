@@ -0,0 +1,65 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+
+from rest_framework import serializers
+
+CHUNK_SIZE = 2000
+
+# Model fields whose values() value is already what the serializer outputs
+PLAIN_FIELDS = (
+    models.AutoField,
+    models.BigAutoField,
+    models.IntegerField,
+    models.CharField,
+    models.TextField,
+    models.BooleanField,
+    models.ForeignKey,
+)
+
+
+def field_columns(model, serializer_class, names=None):
+    """
+    return: [(serializer field name, values() column, converter), ...] for the
+            fields of the serializer (or the given subset), so rows match its
+            representation ; None when a field cannot be read with values().
+    """
+    datetime_field = serializers.DateTimeField()
+    columns = []
+    for name in names or serializer_class.Meta.fields:
+        if name in serializer_class._declared_fields:
+            return None
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if isinstance(field, models.DateTimeField):
+            converter = datetime_field.to_representation
+        elif isinstance(field, PLAIN_FIELDS):
+            converter = None
+        else:
+            return None
+        columns.append((name, field.attname, converter))
+    return columns
+
+
+def to_representation(values, columns):
+    """
+    return: the row of values() as the serializer would represent it.
+    """
+    row = {}
+    for name, attname, converter in columns:
+        value = values[attname]
+        row[name] = converter(value) if converter and value is not None else value
+    return row
+
+
+def rows(queryset, columns):
+    """
+    Iterate over the queryset in chunks with values(), without model instances.
+    """
+    attnames = [attname for _, attname, _ in columns]
+    for values in queryset.values_list(*attnames).iterator(chunk_size=CHUNK_SIZE):
+        row = {}
+        for (name, _, converter), value in zip(columns, values):
+            row[name] = converter(value) if converter and value is not None else value
+        yield row
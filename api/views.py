@@ -1,19 +1,53 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.http import Http404, StreamingHttpResponse
+
 from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 from authentication.models import User
 
-from .models import Project, Issue, Contributor, Comment
+from .models import (
+    ArchivedIssue,
+    Change,
+    Comment,
+    CommentRecord,
+    Contributor,
+    Issue,
+    IssueRecord,
+    Project,
+    ProjectStats,
+)
 from .serializers import (
     CommentSerializer,
     ContributorSerializer,
+    ContributorBulkSerializer,
     ProjectListSerializer,
     ProjectDetailSerializer,
     IssueListSerializer,
     IssueDetailSerializer,
+    IssueBulkItemSerializer,
+    ProjectStatsSerializer,
 )
+from . import archive
+from .cache import membership_cache
+from .db import delete_rows
+from .deletion import soft_delete_issue, soft_delete_project
+from .export import EXPORTS
+from .filters import filter_issues, issue_facets, order_issues
+from . import changes, search, tasks
+from .batch import Batch, BatchSerializer
+from .stats import issues_created
+from .mixins import ConditionalGetMixin, ReplicaReadMixin, ValuesListMixin
+from .signals import invalidate_memberships
 from .permissions import (
     IsAuthorProject,
     IsAuthorComment,
@@ -22,7 +56,7 @@ from .permissions import (
 )
 
 
-class ProjectView(ModelViewSet):
+class ProjectView(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, ModelViewSet):
     """
     GET every projects by the logged in user
     CREATE a new project
@@ -33,6 +67,15 @@ class ProjectView(ModelViewSet):
     serializer_class = ProjectListSerializer
     detail_serializer_class = ProjectDetailSerializer
     permission_classes = [IsAuthenticated, IsAuthorProject]
+    version_lookup_kwarg = "pk"
+    query_budgets = {
+        "list": 4,
+        "retrieve": 5,
+        "stats": 5,
+        "create": 10,
+        "update": 8,
+        "partial_update": 8,
+    }
 
     def get_queryset(self):
         """
@@ -41,12 +84,37 @@ class ProjectView(ModelViewSet):
                 - if the user is not the author or the contributor the project is not displayed.
         """
         user = self.request.user
-        projects = Project.objects.all()
+        projects = Project.objects.filter(contributor_project__user=user).order_by("id")
 
-        contributor = Contributor.objects.filter(project__in=projects, user=user)
-        projects = Project.objects.filter(contributor_project__in=contributor)
+        if self.action == "retrieve":
+            return projects.prefetch_related("contributor_project")
+        return projects.prefetch_related(
+            Prefetch("contributor", queryset=User.objects.only("id"))
+        )
 
-        return projects
+    def get_project_version(self):
+        """
+        Only the contributors get the version of a project (others get a 404).
+        """
+        project_id = self.kwargs.get("pk")
+        if project_id is None:
+            return None
+        if not membership_cache.is_contributor(self.request.user.id, project_id):
+            return None
+        return super().get_project_version()
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        """
+        GET method
+        return: the issues per status (overall and per assignee) and the
+                number of comments of the project, read from ProjectStats.
+        """
+        project = self.get_object()
+        project_stats = ProjectStats.objects.filter(project=project).first()
+        if project_stats is None:
+            project_stats = ProjectStats(project=project)
+        return Response(ProjectStatsSerializer(project_stats).data)
 
     def get_serializer_class(self):
         """
@@ -71,17 +139,24 @@ class ProjectView(ModelViewSet):
         if serializer.is_valid():
             project = serializer.save()
 
-            contributor = Contributor.objects.create(
+            Contributor.objects.create(
                 user=self.request.user, project=project, role="AUTHOR"
             )
-            contributor.save()
 
             serializer = ProjectDetailSerializer(project)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def perform_destroy(self, instance):
+        """
+        DELETE method
+        Soft delete: the project is hidden at once, its issues and comments are
+        removed later by the purge_deleted command.
+        """
+        soft_delete_project(instance)
 
-class IssueView(ModelViewSet):
+
+class IssueView(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, ModelViewSet):
     """
     GET every issues from one project
     CREATE a new issue
@@ -92,15 +167,65 @@ class IssueView(ModelViewSet):
     serializer_class = IssueListSerializer
     detail_serializer_class = IssueDetailSerializer
     permission_classes = [IsAuthenticated, IsAuthorIssue, IsContributor]
+    cursor_ordering = ("created_time", "id")
+    cached_actions = ("list", "retrieve")
+    query_budgets = {
+        "list": 5,
+        "retrieve": 4,
+        "facets": 3,
+        "create": 14,
+        "update": 13,
+        "partial_update": 13,
+    }
 
     def get_queryset(self):
         """
         GET method
         return : every issues from one project
+        The list and the facets can be filtered (see filters.filter_issues)
+        and the list ordered with ?ordering= (ignored by the cursor pagination,
+        which always follows cursor_ordering).
+        The reads with ?include_archived=1 also return the archived issues.
         """
-        issues = Issue.objects.filter(project_id=self.kwargs["project_id"])
+        issues = Issue.objects
+        if self.request.method in SAFE_METHODS and archive.include_archived(self.request):
+            issues = IssueRecord.objects
+        issues = issues.filter(project_id=self.kwargs["project_id"])
+        if self.action in ("list", "facets"):
+            issues = filter_issues(issues, self.request.query_params)
+        if self.action == "list":
+            issues = order_issues(issues, self.request.query_params)
         return issues
 
+    def get_object(self):
+        """
+        An archived issue is restored by its author's updates (e.g. reopening
+        it) and deletion, then changed as any other issue.
+        """
+        try:
+            return super().get_object()
+        except Http404:
+            if self.request.method in SAFE_METHODS or not str(self.kwargs["pk"]).isdigit():
+                raise
+            archived = ArchivedIssue.objects.filter(
+                pk=self.kwargs["pk"],
+                project_id=self.kwargs["project_id"],
+                author_user=self.request.user,
+            )
+            if not archive.restore(archived):
+                raise
+        # restoring moves the issue and its comments, whatever their number
+        self.request._request.query_budget = None
+        return super().get_object()
+
+    @action(detail=False)
+    def facets(self, request, project_id=None):
+        """
+        GET method
+        return : the number of (filtered) issues per status, priority and tag
+        """
+        return Response(issue_facets(self.get_queryset()))
+
     def get_serializer_class(self):
         """
         return : List or Detail serializer
@@ -122,6 +247,9 @@ class IssueView(ModelViewSet):
         project_id = kwargs["project_id"]
         author_user = request.user
 
+        if isinstance(data, list):
+            return self.bulk_create(request, data, project_id)
+
         if data["assignee"] == "":
             assignee = request.user.id
         else:
@@ -148,18 +276,152 @@ class IssueView(ModelViewSet):
         serializer = IssueDetailSerializer(data=new_issue_data, partial=True)
         if serializer.is_valid(project_id):
             new_issue = serializer.save()
+            tasks.issues_changed([new_issue], author_user.id, tasks.CREATED)
             serializer = IssueDetailSerializer(new_issue)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def bulk_create(self, request, items, project_id):
+        """
+        POST Method with a list of issues
+        Every assignee email is resolved with a single query and the valid
+        issues are inserted with one bulk insert in a transaction.
+        ?mode=atomic (default): nothing is created if one item is invalid.
+        ?mode=partial: the valid items are created, the others are reported.
+        return :
+            if every item is OK --> 201 CREATED with the created issues
+            if some items are not OK --> 400 BAD REQUEST (atomic)
+                                     --> 207 MULTI STATUS (partial)
+            each result is {"index", "status", "issue" or "errors"}
+        """
+        mode = request.query_params.get("mode", "atomic")
+        if mode not in ("atomic", "partial"):
+            return Response(
+                {"mode": "The mode must be 'atomic' or 'partial'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_items = getattr(settings, "SOFTDESK_BULK_MAX_ITEMS", 1000)
+        if not items or len(items) > max_items:
+            return Response(
+                {"issues": f"Send between 1 and {max_items} issues."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # the insert batches make the query count grow with the payload
+        request._request.query_budget = None
+
+        emails = {
+            item["assignee"]
+            for item in items
+            if isinstance(item, dict) and isinstance(item.get("assignee"), str)
+        }
+        assignees = dict(
+            User.objects.filter(email__in=emails).values_list("email", "id")
+        )
+
+        results = []
+        new_issues = []
+        for index, item in enumerate(items):
+            errors, issue = self.validate_bulk_item(
+                item, assignees, request.user.id, project_id
+            )
+            if errors:
+                results.append(
+                    {"index": index, "status": status.HTTP_400_BAD_REQUEST, "errors": errors}
+                )
+            else:
+                results.append({"index": index, "status": status.HTTP_201_CREATED})
+                new_issues.append(issue)
+
+        failed = len(new_issues) < len(items)
+        if failed and mode == "atomic":
+            return Response(
+                [result for result in results if "errors" in result],
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            new_issues = Issue.objects.bulk_create(new_issues)
+            issues_created(new_issues)
+            changes.record(
+                project_id, Change.ISSUE, [issue.pk for issue in new_issues], Change.CREATE
+            )
+            tasks.issues_changed(new_issues, request.user.id, tasks.CREATED)
+
+        created = iter(IssueDetailSerializer(new_issues, many=True).data)
+        for result in results:
+            if "errors" not in result:
+                result["issue"] = next(created)
+        return Response(
+            results,
+            status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED,
+        )
+
+    def perform_update(self, serializer):
+        """
+        PUT / PATCH method
+        An "assignee" email reassigns the issue ("" for the logged in user, as
+        in create), the new assignee is notified by a background job.
+        """
+        previous_assignee = serializer.instance.assignee_id
+        changes = {}
+        email = self.request.data.get("assignee")
+        if email == "":
+            changes["assignee_id"] = self.request.user.id
+        elif email is not None:
+            assignee = User.objects.filter(email=email).values_list("id", flat=True).first()
+            if assignee is None:
+                raise NotFound({"Assigned user": f"The user {email} cannot be found."})
+            changes["assignee_id"] = assignee
+        issue = serializer.save(**changes)
+        if issue.assignee_id != previous_assignee:
+            tasks.issues_changed([issue], self.request.user.id, tasks.REASSIGNED)
+
+    def perform_destroy(self, instance):
+        """
+        DELETE method
+        Soft delete: the issue and its comments are hidden at once and removed
+        later by the purge_deleted command.
+        """
+        soft_delete_issue(instance)
+
+    def validate_bulk_item(self, item, assignees, author_user_id, project_id):
+        """
+        return : (errors, None) or (None, the unsaved issue)
+        """
+        if not isinstance(item, dict):
+            return {"non_field_errors": ["Each issue must be an object."]}, None
+
+        email = item.get("assignee", "")
+        if email is not None and not isinstance(email, str):
+            return {"assignee": ["The assignee must be an email."]}, None
+        if not email:
+            assignee = author_user_id
+        elif email in assignees:
+            assignee = assignees[email]
+        else:
+            return {"assignee": [f"The user {email} cannot be found."]}, None
+
+        serializer = IssueBulkItemSerializer(data=item)
+        if not serializer.is_valid():
+            return serializer.errors, None
+        issue = Issue(
+            **serializer.validated_data,
+            author_user_id=author_user_id,
+            assignee_id=assignee,
+            project_id=project_id,
+        )
+        return None, issue
+
 
-class ContributorView(ModelViewSet):
+class ContributorView(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, ModelViewSet):
     """
     GET all contributors from a project
     """
 
     serializer_class = ContributorSerializer
     permission_classes = [IsAuthenticated, IsAuthorProject, IsContributor]
+    cursor_ordering = ("id",)
+    query_budgets = {"list": 5, "retrieve": 4, "create": 8, "bulk": 10}
 
     def get_queryset(self):
         """
@@ -169,18 +431,274 @@ class ContributorView(ModelViewSet):
         contributors = Contributor.objects.filter(project_id=self.kwargs["project_id"])
         return contributors
 
+    @action(detail=False, methods=["post", "delete"])
+    def bulk(self, request, project_id=None):
+        """
+        POST / DELETE Method
+        Add or remove many contributors at once, only for the project's author.
+        The users are resolved with one query, the memberships are inserted or
+        deleted with one statement and the memberships cache is invalidated.
+        The author's own membership is never removed.
+        return :
+            if OK --> 200 OK with the added / removed, skipped and not found users
+            if data validation is not OK --> 400 BAD REQUEST
+            if the user is not the author --> 403 FORBIDDEN
+        """
+        if not membership_cache.is_author(request.user.id, project_id):
+            return Response(
+                {"detail": "Only the author can manage the contributors."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        serializer = ContributorBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        emails = set(serializer.validated_data.get("emails", []))
+        user_ids = set(serializer.validated_data.get("user_ids", []))
+        users = dict(
+            User.objects.filter(Q(email__in=emails) | Q(id__in=user_ids)).values_list(
+                "id", "email"
+            )
+        )
+        not_found = sorted(emails - set(users.values())) + sorted(user_ids - set(users))
+
+        with transaction.atomic():
+            memberships = Contributor.objects.filter(project_id=project_id, user__in=users)
+            members, member_ids = {}, {}
+            for user_id, role, member_id in memberships.values_list("user_id", "role", "id"):
+                members[user_id] = role
+                member_ids[user_id] = member_id
+            if request.method == "POST":
+                changed = [user_id for user_id in users if user_id not in members]
+                Contributor.objects.bulk_create(
+                    [
+                        Contributor(
+                            project_id=project_id,
+                            user_id=user_id,
+                            role=serializer.validated_data["role"],
+                        )
+                        for user_id in changed
+                    ],
+                    ignore_conflicts=True,
+                )
+                # the ids of the rows inserted while ignoring conflicts are not returned
+                changes.record(
+                    project_id,
+                    Change.CONTRIBUTOR,
+                    memberships.filter(user__in=changed).values_list("id", flat=True),
+                    Change.CREATE,
+                )
+                skipped = sorted(members)
+                result = "added"
+            else:
+                changed = [
+                    user_id
+                    for user_id, role in members.items()
+                    if role != Contributor.AUTHOR
+                ]
+                # one DELETE statement without the signals, the memberships
+                # are invalidated below
+                delete_rows(memberships.filter(user__in=changed))
+                changes.record(
+                    project_id,
+                    Change.CONTRIBUTOR,
+                    [member_ids[user_id] for user_id in changed],
+                    Change.DELETE,
+                )
+                skipped = sorted(set(users) - set(changed))
+                result = "removed"
+            invalidate_memberships(project_id, users)
+            if changed:
+                Project.bump_version(pk=project_id)
 
-class CommentView(ModelViewSet):
+        return Response(
+            {result: sorted(changed), "skipped": skipped, "not_found": not_found},
+            status=status.HTTP_200_OK,
+        )
+
+
+class CommentView(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, ModelViewSet):
     """
     GET all comments from an issue
     """
 
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated, IsAuthorComment, IsContributor]
+    cursor_ordering = ("created_time", "id")
+    cached_actions = ("list",)
+    query_budgets = {
+        "list": 5,
+        "retrieve": 4,
+        "create": 9,
+        "update": 6,
+        "partial_update": 6,
+    }
 
     def get_queryset(self):
         """
         GET method
+        The reads with ?include_archived=1 also return the comments of archived issues.
         """
-        comments = Comment.objects.filter(issue_id=self.kwargs["issue_id"])
+        comments = Comment.objects
+        if self.request.method in SAFE_METHODS and archive.include_archived(self.request):
+            comments = CommentRecord.objects
+        comments = comments.filter(issue_id=self.kwargs["issue_id"])
         return comments
+
+
+class ExportView(APIView):
+    """
+    GET every issue of a project with its comments, streamed as a file
+    """
+
+    permission_classes = [IsAuthenticated, IsContributor]
+
+    def get(self, request, project_id):
+        """
+        GET method
+        ?output=ndjson (default): one JSON line per issue with its comments
+        ?output=csv: one row per comment joined to its issue
+        The rows are read with chunked queries and streamed, the memory used
+        does not depend on the size of the project.
+        """
+        output = request.query_params.get("output", "ndjson")
+        if output not in EXPORTS:
+            return Response(
+                {"output": f"The output must be one of {', '.join(EXPORTS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        export, content_type = EXPORTS[output]
+        response = StreamingHttpResponse(export(project_id), content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="project-{project_id}.{output}"'
+        )
+        return response
+
+
+class SearchView(APIView):
+    """
+    GET issues and comments matching ?q=, in one project or in every project
+    of the logged in user
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get_permissions(self):
+        if "project_id" in self.kwargs:
+            return [IsAuthenticated(), IsContributor()]
+        return super().get_permissions()
+
+    def get(self, request, project_id=None):
+        """
+        GET method
+        Ranked full-text search with highlighted snippets: HTML, the text
+        escaped and the matched words in <mark>.
+        ?q=: the searched words, the last one is matched as a prefix
+        ?page_size=: number of results, up to SOFTDESK_CURSOR_MAX_PAGE_SIZE
+        ?cursor=: the cursor given in "next" by the previous page
+        return :
+            if OK --> 200 OK with the results and the next page link
+            if the query or the cursor is not valid --> 400 BAD REQUEST
+        """
+        text = request.query_params.get("q", "")
+        if not text.strip():
+            return Response(
+                {"q": "This parameter is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            page_size = int(request.query_params.get("page_size", api_settings.PAGE_SIZE))
+        except ValueError:
+            page_size = api_settings.PAGE_SIZE
+        max_page_size = getattr(settings, "SOFTDESK_CURSOR_MAX_PAGE_SIZE", 100)
+        page_size = max(1, min(page_size, max_page_size))
+
+        try:
+            results, cursor = search.search(
+                text,
+                page_size,
+                project_id=project_id,
+                user_id=None if project_id else request.user.id,
+                cursor=request.query_params.get("cursor"),
+            )
+        except search.InvalidCursor as error:
+            return Response({"cursor": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        next_url = None
+        if cursor is not None:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), "cursor", cursor
+            )
+        return Response({"next": next_url, "results": results})
+
+
+class ChangesView(APIView):
+    """
+    GET the changes of the issues, comments and contributors of a project
+    since a sync token, for the delta sync clients
+    """
+
+    permission_classes = [IsAuthenticated, IsContributor]
+
+    def get(self, request, project_id):
+        """
+        GET method
+        Without ?since=: the token to sync from, read it before downloading the project.
+        ?since=: the changes after the token, one per object (see changes.changes_since)
+        ?limit=: number of log entries read, up to SOFTDESK_CHANGES_MAX_BATCH_SIZE
+        return :
+            if OK --> 200 OK with the changes, the next token in "since" and
+                      "more" when the client should ask again at once
+            if the token is not valid --> 400 BAD REQUEST
+            if the changes after the token expired --> 410 GONE, download the project again
+        """
+        since = request.query_params.get("since")
+        if since is None:
+            return Response(
+                {"since": changes.current_sequence(), "more": False, "changes": []}
+            )
+        if not since.isdigit():
+            return Response(
+                {"since": "Expected a token given by a previous response."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = int(request.query_params.get("limit", changes.CHANGES_BATCH_SIZE))
+        except ValueError:
+            limit = changes.CHANGES_BATCH_SIZE
+        max_limit = getattr(settings, "SOFTDESK_CHANGES_MAX_BATCH_SIZE", 1000)
+        limit = max(1, min(limit, max_limit))
+
+        try:
+            project_changes, next_since, more = changes.changes_since(
+                project_id, int(since), limit
+            )
+        except changes.ChangesExpired as error:
+            return Response(
+                {"detail": f"{error} Download the project again.", "since": error.horizon},
+                status=status.HTTP_410_GONE,
+            )
+        return Response({"since": next_since, "more": more, "changes": project_changes})
+
+
+class BatchView(APIView):
+    """
+    POST a list of api requests run in one round trip (see batch.Batch)
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        POST method
+        {"requests": [{"id", "method", "path", "body", "depends_on"}, ...]}
+        A path or a body can use the response of a previous request:
+        "/projects/1/issues/{issues.results.*.id}/comments/" is run for each issue.
+        return :
+            if the batch is valid --> 200 OK with {"responses": [{"id", "status", "body"}, ...]},
+                                      each request has its own status
+            if not --> 400 BAD REQUEST
+        """
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        responses = Batch(request).run(serializer.validated_data["requests"])
+        return Response({"responses": responses})
@@ -0,0 +1,34 @@
+from django.db import router
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+from .tokens import USER_CLAIMS, VERSION_CLAIM, check_token_version
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication building request.user from the token claims:
+        - the user is a User instance with only id, email, is_active and
+          token_version loaded, other fields are read from the database
+          the first time they are accessed ;
+        - forced logout and deactivation are checked against the cached
+          token version (see tokens.py) instead of loading the user ;
+        - tokens issued without these claims fall back to loading the user.
+    """
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        check_token_version(validated_token)
+        field_names = ["id", *USER_CLAIMS, "token_version"]
+        values = [user_id, *(validated_token.get(name) for name in USER_CLAIMS)]
+        values.append(validated_token[VERSION_CLAIM])
+        return User.from_db(router.db_for_read(User), field_names, values)
@@ -1,6 +1,24 @@
 from django.contrib.auth.models import AbstractUser
+from django.db import models
+from django.db.models import F
 
 
 class User(AbstractUser):
+    # Copied into the issued tokens, incrementing it revokes them (see tokens.py)
+    token_version = models.PositiveIntegerField(default=1)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [models.Index(fields=["email"], name="user_email")]
+
     def __str__(self):
         return self.email
+
+    def revoke_tokens(self):
+        """
+        Force logout: every token issued so far stops being accepted.
+        """
+        from .tokens import token_versions
+
+        User.objects.filter(pk=self.pk).update(token_version=F("token_version") + 1)
+        self.refresh_from_db(fields=["token_version"])
+        token_versions.invalidate(self.pk)
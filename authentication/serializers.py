@@ -1,8 +1,14 @@
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.password_validation import validate_password
 
 from .models import User
+from .tokens import VERSION_CLAIM, check_token_version, user_claims
 
 
 class RegisterUserSerializer(serializers.ModelSerializer):
@@ -60,3 +66,29 @@ class RegisterUserSerializer(serializers.ModelSerializer):
         user.save()
 
         return user
+
+
+class LoginSerializer(TokenObtainPairSerializer):
+    """
+    Token pair with the user claims, so requests are authenticated without
+    loading the user (see authentication.StatelessJWTAuthentication).
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in user_claims(user).items():
+            token[claim] = value
+        return token
+
+
+class LoginRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuse to refresh a token revoked by a forced logout or a deactivation.
+    """
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs["refresh"])
+        if VERSION_CLAIM in refresh:
+            check_token_version(refresh)
+        return super().validate(attrs)
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+from .tokens import token_versions
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_token_version(sender, instance, **kwargs):
+    """
+    A deactivated or deleted user, or a new token version, is seen by the next request.
+    """
+    token_versions.invalidate(instance.pk)
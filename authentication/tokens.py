@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+# Claims added to the tokens so a request can be authenticated without loading the user
+USER_CLAIMS = ["email", "is_active"]
+VERSION_CLAIM = "ver"
+
+
+def user_claims(user):
+    """
+    return: the claims describing the user, added to the issued tokens.
+    """
+    claims = {name: getattr(user, name) for name in USER_CLAIMS}
+    claims[VERSION_CLAIM] = user.token_version
+    return claims
+
+
+class TokenVersionCache:
+    """
+    Cross-request cache of the token version of each user:
+        - the value is the current token_version, or 0 when the user is
+          inactive or deleted, so the tokens of these users are refused ;
+        - backed by any Django cache backend (SOFTDESK_TOKEN_VERSION_CACHE alias) ;
+        - invalidated by the User signals (see signals.py) and User.revoke_tokens().
+    """
+
+    INACTIVE = 0
+
+    @property
+    def backend(self):
+        return caches[getattr(settings, "SOFTDESK_TOKEN_VERSION_CACHE", "default")]
+
+    @property
+    def timeout(self):
+        return getattr(settings, "SOFTDESK_TOKEN_VERSION_CACHE_TIMEOUT", 300)
+
+    @staticmethod
+    def make_key(user_id):
+        return f"softdesk:token_version:{user_id}"
+
+    def get(self, user_id):
+        key = self.make_key(user_id)
+        version = self.backend.get(key)
+        if version is not None:
+            return version
+
+        # cached across requests: read from the primary, never a replica
+        row = (
+            User.objects.using(DEFAULT_DB_ALIAS)
+            .filter(pk=user_id)
+            .values_list("token_version", "is_active")
+            .first()
+        )
+        version = row[0] if row and row[1] else self.INACTIVE
+        self.backend.set(key, version, self.timeout)
+        return version
+
+    def invalidate(self, user_id):
+        self.backend.delete(self.make_key(user_id))
+
+
+token_versions = TokenVersionCache()
+
+
+def check_token_version(token):
+    """
+    Refuse a token issued before a forced logout, or for an inactive user.
+    """
+    version = token_versions.get(token[api_settings.USER_ID_CLAIM])
+    if version == TokenVersionCache.INACTIVE:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+    if version != token[VERSION_CLAIM]:
+        raise AuthenticationFailed("Token has been revoked", code="token_revoked")
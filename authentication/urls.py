@@ -1,10 +1,19 @@
 from django.urls import path
+from .serializers import LoginRefreshSerializer, LoginSerializer
 from .views import RegisterView
 
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
-    path("login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("login/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path(
+        "login/",
+        TokenObtainPairView.as_view(serializer_class=LoginSerializer),
+        name="token_obtain_pair",
+    ),
+    path(
+        "login/refresh/",
+        TokenRefreshView.as_view(serializer_class=LoginRefreshSerializer),
+        name="token_refresh",
+    ),
     path("signup/", RegisterView.as_view()),
 ]
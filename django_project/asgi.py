@@ -2,6 +2,8 @@
 ASGI config for django_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The live events of the projects (GET /projects/<id>/events/) are only served
+by this entry point, see api/live.py.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
@@ -13,4 +15,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once the apps are loaded by get_asgi_application()
+from api.live import live_events  # noqa: E402
+
+application = live_events(django_application)
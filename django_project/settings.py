@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -85,6 +86,28 @@ DATABASES = {
     }
 }
 
+# Read replicas: aliases of DATABASES serving the safe-method requests of the
+# api viewsets (see api/db.py). A local SQLite copy can stand in for one:
+#   DATABASES["replica"] = {
+#       "ENGINE": "django.db.backends.sqlite3",
+#       "NAME": BASE_DIR / "replica.sqlite3",
+#       "TEST": {"MIRROR": "default"},
+#   }
+#   SOFTDESK_DATABASE_REPLICAS = ["replica"]
+# and be refreshed from the primary with `manage.py sync_replicas`.
+SOFTDESK_DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ["api.db.ReplicaRouter"]
+
+# Pragmas applied to every new SQLite connection
+SOFTDESK_SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "busy_timeout": 5000,
+    "temp_store": "memory",
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -129,15 +152,98 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "authentication.User"
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "softdesk",
+    }
+}
+
+# Project memberships cache used by the api permissions
+SOFTDESK_MEMBERSHIP_CACHE = "default"
+SOFTDESK_MEMBERSHIP_CACHE_TIMEOUT = 300
+
+# Token versions checked by authentication.authentication.StatelessJWTAuthentication
+SOFTDESK_TOKEN_VERSION_CACHE = "default"
+SOFTDESK_TOKEN_VERSION_CACHE_TIMEOUT = 300
+
+# Versioned cache of the issue and comment list / detail responses
+SOFTDESK_RESPONSE_CACHE = "default"
+SOFTDESK_RESPONSE_CACHE_TIMEOUT = 300
+SOFTDESK_RESPONSE_CACHE_MAX_ENTRIES = 1000
+SOFTDESK_RESPONSE_CACHE_MAX_ENTRY_SIZE = 512 * 1024
+
+# List actions read plain columns with values() instead of the serializers
+SOFTDESK_VALUES_FAST_PATH = True
+
 # Pagination Rest framework
 REST_FRAMEWORK = {
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.SoftDeskPagination",
     "PAGE_SIZE": 5,
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "authentication.authentication.StatelessJWTAuthentication",
     ),
+    # orjson / msgpack are optional, see api/renderers.py
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "api.renderers.MessagePackRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "api.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        "api.renderers.MessagePackParser",
+    ),
+    "DEFAULT_CONTENT_NEGOTIATION_CLASS": "api.renderers.SoftDeskContentNegotiation",
 }
 
+# Query instrumentation (api.middleware.QueryInstrumentationMiddleware)
+SOFTDESK_QUERY_HEADERS = DEBUG
+SOFTDESK_QUERY_STATS_WINDOW = 500
+SOFTDESK_QUERY_BUDGET_STRICT = False
+
+# Cursor pagination (?pagination=cursor) on issues, comments and contributors
+SOFTDESK_CURSOR_MAX_PAGE_SIZE = 100
+
+# Maximum number of issues in one bulk creation (POST of a list)
+SOFTDESK_BULK_MAX_ITEMS = 1000
+
+# Requests run by one POST /batch/, and values a request of it can fan out over
+SOFTDESK_BATCH_MAX_REQUESTS = 20
+
+# Closed issues created before this many days are moved to the archive tables
+# by the archive_issues command (read back with ?include_archived=1)
+SOFTDESK_ARCHIVE_AFTER_DAYS = 90
+
+# Background jobs (api.jobs), run by the run_workers command: attempts before a
+# job is marked failed, first retry delay (doubled on each retry, in seconds)
+# and time a worker has to finish a job before another one takes it back
+SOFTDESK_JOB_MAX_ATTEMPTS = 5
+SOFTDESK_JOB_RETRY_DELAY = 10
+SOFTDESK_JOB_MAX_RETRY_DELAY = 3600
+SOFTDESK_JOB_LEASE = 300
+
+# Change log of the projects (GET /projects/<id>/changes/?since=): entries
+# read per request at most, and days kept by the compact_changes command
+SOFTDESK_CHANGES_MAX_BATCH_SIZE = 1000
+SOFTDESK_CHANGES_RETENTION_DAYS = 30
+
+# Live events of the projects served by django_project/asgi.py (see api/live.py):
+# pub/sub backend (api.pubsub.PubSubBackend), events buffered per connection
+# before it is evicted, and seconds of silence before a heartbeat. The local
+# backend only reaches the connections of the process the write was made in.
+SOFTDESK_LIVE_BACKEND = "api.pubsub.LocalPubSub"
+SOFTDESK_LIVE_BUFFER_SIZE = 100
+SOFTDESK_LIVE_HEARTBEAT = 15
+
+# Notifications sent by the background jobs
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+DEFAULT_FROM_EMAIL = "SoftDesk <noreply@softdesk.local>"
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),